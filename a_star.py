@@ -1,5 +1,8 @@
 import operator
 import heapq
+import metrics
+
+INF = float("inf")
 
 class PriorityQueue:
     def __init__(self):
@@ -41,16 +44,19 @@ class AStar:
         cost_so_far = {}
         came_from[self.hash(root)] = None
         cost_so_far[self.hash(root)] = 0
+        track = metrics.enabled
+        if track: metrics.count("astar_searches")
 
         while not frontier.empty():
             current = frontier.get()
+            if track:
+                metrics.count("astar_expansions")
+                metrics.peak("astar_frontier", len(frontier.elements) + 1)
 
             if self.is_goal(current):
                 return self.reconstruct_path(came_from, root, current)
 
             for succ in self.successors(current):
-                if succ in cost_so_far: continue
-
                 new_g = cost_so_far[self.hash(current)] + self.cost(current, succ)
                 if succ not in cost_so_far or new_g < cost_so_far[self.hash(succ)]:
                     
@@ -68,3 +74,92 @@ class AStar:
             current = came_from[self.hash(current)]
             path.append(current)
         return path
+
+
+
+class GridAStar(object):
+    """
+    A* for 4-connected, unit cost moves on a width x height grid
+
+    cells are flat indices (x * height + y).  the g-score and parent arrays and the closed
+    bitmap are allocated once and reset only where a search touched them, so one instance
+    can be reused for many searches on the same grid
+    """
+
+    def __init__(self, width, height):
+        self.width      = width
+        self.height     = height
+        self.g          = [INF] * (width * height)
+        self.parent     = [-1] * (width * height)
+        self.closed     = bytearray(width * height)
+        self.expansions = 0
+
+    # solve from start to goal, moving only through cells where passable[index] is true.
+    # start and goal are (x, y) and always allowed.  return [start, ..., goal] or None
+    def solve(self, start, goal, passable):
+        W = self.width
+        H = self.height
+        g = self.g
+        parent = self.parent
+        closed = self.closed
+
+        gx, gy = goal
+        src = start[0] * H + start[1]
+        dst = gx * H + gy
+
+        g[src] = 0
+        parent[src] = -1
+        touched = [src]
+        h0 = abs(start[0] - gx) + abs(start[1] - gy)
+        frontier = [(h0, h0, src)]
+        self.expansions = 0
+        found = False
+        track = metrics.enabled
+        frontier_peak = 1
+
+        while frontier:
+            _, _, current = heapq.heappop(frontier)
+            if closed[current]: continue
+            if current == dst:
+                found = True
+                break
+
+            closed[current] = 1
+            self.expansions += 1
+
+            cx, cy = divmod(current, H)
+            new_g = g[current] + 1
+            for succ, nx, ny, in_bounds in ((current - H, cx - 1, cy, 0 < cx),
+                                            (current + H, cx + 1, cy, cx < W - 1),
+                                            (current - 1, cx, cy - 1, 0 < cy),
+                                            (current + 1, cx, cy + 1, cy < H - 1)):
+                if not in_bounds or closed[succ]: continue
+                if not (passable[succ] or succ == dst): continue
+                if new_g < g[succ]:
+                    if INF == g[succ]: touched.append(succ)
+                    g[succ] = new_g
+                    parent[succ] = current
+                    h = abs(nx - gx) + abs(ny - gy)
+                    heapq.heappush(frontier, (new_g + h, h, succ))
+                    if track and len(frontier) > frontier_peak: frontier_peak = len(frontier)
+
+        path = None
+        if found:
+            path = []
+            current = dst
+            while -1 != current:
+                path.append(divmod(current, H))
+                current = parent[current]
+            path.reverse()
+
+        # leave the arrays clean for the next search
+        for i in touched:
+            g[i] = INF
+            closed[i] = 0
+
+        if track:
+            metrics.count("astar_searches")
+            metrics.count("astar_expansions", self.expansions)
+            metrics.peak("astar_frontier", frontier_peak)
+
+        return path
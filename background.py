@@ -1,30 +1,111 @@
 
+import numpy
+
+
+def lane_runs(lanes):
+    """
+    for each row of a 2D boolean array, the list of (lo, hi) runs of True, inclusive
+    """
+    n, length = lanes.shape
+    padded = numpy.zeros((n, length + 2), dtype=numpy.int8)
+    padded[:, 1:-1] = lanes
+    edges = numpy.diff(padded, axis=1)
+
+    sl, sp = numpy.nonzero(1 == edges)
+    el, ep = numpy.nonzero(-1 == edges)
+
+    runs = [[] for i in range(n)]
+    for lane, lo, hi in zip(sl.tolist(), sp.tolist(), (ep - 1).tolist()):
+        runs[lane].append((lo, hi))
+    return runs
+
+
 
 class Background(object):
 
     def __init__(self, table, ball):
         self.table = table
         self.ball = ball
-        self.canvas = table.drawing_area
+        self.canvas = table.get_drawing_area()
 
 
 class LinearBackground(Background):
+    """
+    straight lanes over the visited area that isn't foreground
 
-    def __init__(self, table, ball):
+    lanes are every spacing rows (orientation "horizontal", constant y) or columns
+    ("vertical", constant x), starting at 0; spacing defaults to the ball diameter.  each
+    lane is cut into its runs of background, and the lanes are driven in alternating directions
+    """
+
+    def __init__(self, table, ball, spacing=None, orientation="horizontal"):
         super(LinearBackground, self).__init__(table, ball)
-        self.lines = []
-
-    def solve(self, visited, is_foreground):
-        diameter = self.ball.radius * 2
-        bins = int(self.table.table_height / diameter)
-        self.lines = [[]] * bins
-        for (x, y) in visited:
-            if is_foreground[(x, y)]: continue
-            if 0 == y % diameter:
-                bin = int(y / diameter)
-                self.lines[bin].append((x, y))
-        
+        self.spacing = spacing
+        self.orientation = orientation
+        self.runs = []      # (lo, hi) runs of background along each lane
+        self.segments = []  # ((x, y), (x, y)) start and end of each run, in driving order
+
+    def solve(self, visited, foreground):
+        """
+        visited and foreground are boolean arrays indexed [x][y]
+        """
+        self.runs = lane_runs(self.lanes(visited, foreground))
+        self.order_segments()
+
+    def update(self, visited, foreground, region):
+        """
+        redo just the lanes that cross the (x0, y0, x1, y1) region, x1 and y1 exclusive
+        """
+        spacing = self.spacing or self.ball.radius * 2
+        x0, y0, x1, y1 = region
+        lo, hi = (y0, y1) if "horizontal" == self.orientation else (x0, x1)
+
+        first, last = (lo + spacing - 1) // spacing, (hi - 1) // spacing
+        if first > last: return
+        self.runs[first:last + 1] = lane_runs(self.lanes(visited, foreground, first * spacing, last * spacing + 1))
+        self.order_segments()
+
+    def lanes(self, visited, foreground, lo=0, hi=None):
+        # the background along each lane from lo up to hi, one lane per row
+        spacing = self.spacing or self.ball.radius * 2
+        visited = numpy.asarray(visited, dtype=bool)
+        foreground = numpy.asarray(foreground, dtype=bool)
+        if "horizontal" == self.orientation:
+            return (visited[:, lo:hi:spacing] & ~foreground[:, lo:hi:spacing]).T
+        return visited[lo:hi:spacing] & ~foreground[lo:hi:spacing]
+
+    def order_segments(self):
+        # lay the runs end to end, in alternating directions
+        spacing = self.spacing or self.ball.radius * 2
+        horizontal = "horizontal" == self.orientation
+
+        def point(lane, p):
+            return (p, lane * spacing) if horizontal else (lane * spacing, p)
+
+        self.segments = []
+        forward = True
+        for lane, runs in enumerate(self.runs):
+            if not runs: continue
+            if not forward:
+                runs = [(hi, lo) for (lo, hi) in reversed(runs)]
+            self.segments += [(point(lane, a), point(lane, b)) for (a, b) in runs]
+            forward = not forward
+
+    def get_lines(self):
+        """
+        each segment as a list of adjacent (x, y) points
+        """
+        lines = []
+        for (x0, y0), (x1, y1) in self.segments:
+            step = 1 if (x1 + y1) >= (x0 + y0) else -1
+            if y0 == y1:
+                lines.append([(x, y0) for x in range(x0, x1 + step, step)])
+            else:
+                lines.append([(x0, y) for y in range(y0, y1 + step, step)])
+        return lines
+
     def draw(self):
-        for i, l in enumerate(self.lines):
-            for (x, y) in l:
-                self.table.draw_point(x, y, "black")
+        for (x0, y0), (x1, y1) in self.segments:
+            xs = numpy.arange(min(x0, x1), max(x0, x1) + 1)
+            ys = numpy.arange(min(y0, y1), max(y0, y1) + 1)
+            self.table.draw_points(numpy.column_stack(numpy.broadcast_arrays(xs, ys)), "black")
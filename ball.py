@@ -1,82 +1,114 @@
 
-import math
+import numpy
+
+
+class BallTemplates(object):
+    """
+    the offsets covered by a ball of a given radius, computed once and shared
+
+    coverage, shell and the two radius-sorted orders are (n, 2) integer arrays of (x, y)
+    offsets from the center; mask is the coverage as a (2r - 1) square boolean array.
+    the arrays are read-only so they can be handed out as views
+    """
+
+    def __init__(self, radius):
+        rr = radius - 1
+        self.radius = radius
+
+        # all offsets in a square, x-major, and which of them are within the ball
+        xs, ys = numpy.mgrid[-rr:rr + 1, -rr:rr + 1]
+        dists = numpy.hypot(xs, ys)
+        self.mask = rr >= dists
+
+        self.coverage = numpy.column_stack((xs[self.mask], ys[self.mask]))
+        self.coverage_list = [tuple(p) for p in self.coverage.tolist()]
+
+        # shell: points with a 4-neighbor outside the ball
+        padded = numpy.zeros((2 * rr + 3, 2 * rr + 3), dtype=bool)
+        padded[1:-1, 1:-1] = self.mask
+        interior = padded[2:, 1:-1] & padded[:-2, 1:-1] & padded[1:-1, 2:] & padded[1:-1, :-2]
+        self.shell = numpy.column_stack((xs[self.mask & ~interior], ys[self.mask & ~interior]))
+        self.shell_list = [tuple(p) for p in self.shell.tolist()]
+
+        # radius-sorted, keeping the x-major order between points at the same distance
+        r = dists[self.mask]
+        self.sorted = {True:  self.coverage[numpy.argsort(r, kind="mergesort")],
+                       False: self.coverage[numpy.argsort(-r, kind="mergesort")]}
+        self.sorted_list = dict((k, [tuple(p) for p in v.tolist()]) for (k, v) in self.sorted.items())
+
+        for a in [self.mask, self.coverage, self.shell] + self.sorted.values():
+            a.flags.writeable = False
+
+
+# process-wide cache of templates, by radius
+templates_by_radius = {}
+
+def get_templates(radius):
+    if radius not in templates_by_radius:
+        templates_by_radius[radius] = BallTemplates(radius)
+    return templates_by_radius[radius]
+
+
 
 class Ball(object):
 
     def __init__(self, radius):
         self.radius = radius
-        self.coverage_template = Ball.get_coverage_template(radius)
-        self.shell_template    = Ball.get_shell_template(self.coverage_template)
-        self.sorted_template   = {}
+        self.templates         = get_templates(radius)
+        self.coverage_template = self.templates.coverage_list
+        self.shell_template    = self.templates.shell_list
+        self.sorted_template   = self.templates.sorted_list
+        self.mask              = self.templates.mask
 
 
     @staticmethod
     def get_coverage_template(radius):
         """
         get a list of (x, y) points covered by a ball with radius
-        
-        """
 
-        rr = radius - 1
-        
-        out = []
-        for x in range(0 - rr, rr + 1):
-            for y in range(0 - rr, rr + 1):
-                if rr >= math.hypot(x, y):
-                    out.append((x,y))
-        return out
+        """
+        return get_templates(radius).coverage_list[:]
 
 
     @staticmethod
     def get_shell_template(template):
         """
         get a list of (x, y) points that touch non-ball neighbors
-        
+
         in other words, any point that has a neighbor that's not in the ball template
         """
 
+        members = set(template)
         return [(x, y) for (x, y) in template
-                if not all(map(template.__contains__,
-                               [(x + 1, y),
-                                (x - 1, y),
-                                (x,     y + 1),
-                                (x,     y - 1)]))]
+                if not ((x + 1, y) in members and
+                        (x - 1, y) in members and
+                        (x,     y + 1) in members and
+                        (x,     y - 1) in members)]
 
 
-    def coverage(self, ctr_x, ctr_y):
+    def coverage(self, ctr_x, ctr_y, as_array=False):
         """
         get a list of (x, y) points covered by a ball at given center (ctr_x, ctr_y)
-        
-        points that overlap the edges are considered
+
+        points that overlap the edges are considered.  with as_array, get an (n, 2) array instead
         """
+        if as_array: return self.templates.coverage + (ctr_x, ctr_y)
         return self._coverage(ctr_x, ctr_y, self.coverage_template)
 
 
 
-    def shell(self, ctr_x, ctr_y):
+    def shell(self, ctr_x, ctr_y, as_array=False):
         """
         get a list of (x, y) points covered by the shell of a ball at given center
         """
-        
+        if as_array: return self.templates.shell + (ctr_x, ctr_y)
         return [(x + ctr_x, y + ctr_y) for (x, y) in self.shell_template]
 
 
-    def coverage_sorted(self, ctr_x, ctr_y, do_center_first):
-        self.check_sorted_template(do_center_first)
+    def coverage_sorted(self, ctr_x, ctr_y, do_center_first, as_array=False):
+        if as_array: return self.templates.sorted[do_center_first] + (ctr_x, ctr_y)
         return self._coverage(ctr_x, ctr_y, self.sorted_template[do_center_first])
 
 
     def _coverage(self, ctr_x, ctr_y, template):
         return [(x + ctr_x, y + ctr_y) for (x, y) in template]
-    
-
-    def check_sorted_template(self, do_center_first):
-        """
-        create a template sorted by radius if it does not already exist
-        """
-        if do_center_first in self.sorted_template: return
-
-        dists = [((x, y), math.hypot(x, y)) for (x, y) in self.coverage_template]
-        key_fn = lambda (p, r): r
-        pairs = sorted(dists, key=key_fn, reverse=(not do_center_first))
-        self.sorted_template[do_center_first] = [p for (p, r) in pairs]
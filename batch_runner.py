@@ -0,0 +1,149 @@
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import numpy
+
+from table_model import TableModel
+from boustrophedon_solver import BoustrophedonSolver
+from contour_solver import ContourSolver
+from background import LinearBackground
+from ball import Ball
+import metrics
+
+BALL_RADIUS = 10 # as in table_main
+
+
+def solve_layout(job):
+    """
+    solve one layout file and summarize it; job is (filename, options).  runs in a pool
+    process, so everything comes back as plain data and failures come back as an error
+    """
+    filename, options = job
+    summary = {"layout": os.path.basename(filename)}
+    times = summary["times"] = {}
+    metrics.enable(options.get("metrics", False))
+    metrics.reset()
+    try:
+        t = time.time()
+        table = TableModel.load(filename)
+        times["load"] = time.time() - t
+
+        ball = Ball(options["radius"])
+        bs = BoustrophedonSolver(table, ball)
+        bs.coverage_mode = options["mode"]
+        cs = ContourSolver(table, ball, bs.is_rockpoint)
+        bg = LinearBackground(table, ball)
+
+        t = time.time()
+        bs.solve()
+        times["coverage"] = time.time() - t
+
+        t = time.time()
+        cs.solve_field(bs.get_reachable_list(), options["contours"])
+        times["proximity"] = time.time() - t
+
+        t = time.time()
+        cs.trace_contours()
+        times["contours"] = time.time() - t
+
+        t = time.time()
+        bg.solve(bs.reachable, cs.foreground)
+        times["background"] = time.time() - t
+
+        visited = numpy.count_nonzero(bs.visited)
+        sand = table.table_width * table.table_height - numpy.count_nonzero(numpy.asarray(table.rockpoint))
+        path_length = max(0, len(bs.path) - 1)
+        summary.update({
+            "width":            table.table_width,
+            "height":           table.table_height,
+            "path_length":      path_length,
+            "visited":          visited,
+            "efficiency":       100.0 * visited / path_length if path_length else 0.0,
+            "covered_fraction": float(numpy.count_nonzero(bs.covered)) / sand if sand else 0.0,
+            "contours":         len(cs.contours),
+            "background":       len(bg.segments),
+            })
+    except Exception as e:
+        summary["error"] = "%s: %s" % (type(e).__name__, e)
+
+    times["total"] = sum(times.values())
+    if metrics.enabled:
+        summary["metrics"] = metrics.report()
+    return summary
+
+
+def layout_files(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if not name.startswith(".") and os.path.isfile(os.path.join(directory, name)))
+
+
+def run_batch(directory, output_file, processes=None, num_contours=3, radius=BALL_RADIUS, mode="flood",
+              collect_metrics=False):
+    """
+    solve every layout in directory (text layouts or rock maps) across a process pool
+
+    layouts are handed out one at a time, since their sizes vary.  writes a summary of each
+    layout plus totals to output_file as JSON, and returns it.  with collect_metrics, each
+    layout's summary also has its hot path counts (see metrics.report)
+    """
+    options = {"contours": num_contours, "radius": radius, "mode": mode, "metrics": collect_metrics}
+    jobs = [(f, options) for f in layout_files(directory)]
+
+    start = time.time()
+    pool = multiprocessing.Pool(processes)
+    try:
+        layouts = []
+        for summary in pool.imap_unordered(solve_layout, jobs, chunksize=1):
+            print "Solved", summary["layout"], "in", round(summary["times"]["total"], 2), "s",
+            print summary.get("error", "")
+            layouts.append(summary)
+    finally:
+        pool.close()
+        pool.join()
+    wall_time = time.time() - start
+
+    layouts.sort(key=lambda s: s["layout"])
+    solved = [s for s in layouts if "error" not in s]
+    stages = ["load", "coverage", "proximity", "contours", "background", "total"]
+    results = {
+        "directory": directory,
+        "options":   options,
+        "processes": processes or multiprocessing.cpu_count(),
+        "wall_time": wall_time,
+        "totals": {
+            "layouts":     len(layouts),
+            "failed":      len(layouts) - len(solved),
+            "path_length": sum(s["path_length"] for s in solved),
+            "times":       dict((k, sum(s["times"].get(k, 0.0) for s in layouts)) for k in stages),
+            },
+        "layouts":   layouts,
+        }
+
+    with open(output_file, "w") as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+
+    print "Solved", len(solved), "of", len(layouts), "layouts in", round(wall_time, 2), "s"
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Solve a directory of zen table rock layouts in parallel")
+    parser.add_argument("directory", help="directory of rock layouts (text or rock map files)")
+    parser.add_argument("output", help="where to write the JSON summary")
+    parser.add_argument("--processes", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--contours", type=int, default=3, help="number of contours around rocks")
+    parser.add_argument("--radius", type=int, default=BALL_RADIUS, help="ball radius in pixels")
+    parser.add_argument("--mode", choices=["flood", "cells"], default="flood", help="coverage mode")
+    parser.add_argument("--metrics", action="store_true", help="also collect hot path counts for each layout")
+    args = parser.parse_args(argv)
+
+    run_batch(args.directory, args.output, args.processes, args.contours, args.radius, args.mode, args.metrics)
+
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,211 @@
+
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy
+
+import ball
+from ball import Ball
+from table_model import TableModel
+from rock_map import RockMap
+from boustrophedon_solver import BoustrophedonSolver
+from contour_solver import ContourSolver
+from background import LinearBackground
+from sand_ripple import SandRipple
+
+BALL_RADIUS = 10 # as in table_main
+NUM_CONTOURS = 3
+SIZES = [200, 500, 1000, 2000]
+
+
+# layout generators: (width, height, numpy RandomState) -> boolean rock array indexed [x][y]
+
+def stamp_disc(rocks, x, y, r):
+    w, h = rocks.shape
+    x0, x1, y0, y1 = max(0, x - r), min(w, x + r + 1), max(0, y - r), min(h, y + r + 1)
+    xs, ys = numpy.ogrid[x0:x1, y0:y1]
+    rocks[x0:x1, y0:y1] |= (xs - x) ** 2 + (ys - y) ** 2 <= r * r
+
+
+def dots(w, h, rng):
+    # sparse small pebbles
+    rocks = numpy.zeros((w, h), dtype=bool)
+    for i in range(w * h // 4000):
+        stamp_disc(rocks, rng.randint(w), rng.randint(h), rng.randint(0, 3))
+    return rocks
+
+
+def walls(w, h, rng):
+    # long straight walls, some across most of the table
+    rocks = numpy.zeros((w, h), dtype=bool)
+    for i in range(max(2, w // 100)):
+        length = rng.randint(min(w, h) // 4, 3 * min(w, h) // 4)
+        thickness = rng.randint(1, 4)
+        x, y = rng.randint(w), rng.randint(h)
+        if rng.randint(2):
+            rocks[x:x + length, y:y + thickness] = True
+        else:
+            rocks[x:x + thickness, y:y + length] = True
+    return rocks
+
+
+def maze(w, h, rng, cell=60):
+    # a perfect maze with thin walls, corridors wide enough for the ball
+    nx, ny = max(1, w // cell), max(1, h // cell)
+    rocks = numpy.zeros((w, h), dtype=bool)
+    rocks[::cell, :ny * cell] = True
+    rocks[:nx * cell, ::cell] = True
+
+    # knock down walls along a randomized depth-first spanning tree
+    seen = numpy.zeros((nx, ny), dtype=bool)
+    stack = [(0, 0)]
+    seen[0, 0] = True
+    while stack:
+        cx, cy = stack[-1]
+        options = [(cx + dx, cy + dy) for (dx, dy) in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                   if 0 <= cx + dx < nx and 0 <= cy + dy < ny and not seen[cx + dx, cy + dy]]
+        if not options:
+            stack.pop()
+            continue
+        ax, ay = options[rng.randint(len(options))]
+        if ax != cx:
+            rocks[max(cx, ax) * cell, cy * cell + 1:(cy + 1) * cell] = False
+        else:
+            rocks[cx * cell + 1:(cx + 1) * cell, max(cy, ay) * cell] = False
+        seen[ax, ay] = True
+        stack.append((ax, ay))
+    return rocks
+
+
+def clutter(w, h, rng):
+    # lots of rocks of all sizes
+    rocks = numpy.zeros((w, h), dtype=bool)
+    for i in range(w * h // 3000):
+        stamp_disc(rocks, rng.randint(w), rng.randint(h), rng.randint(2, 9))
+    return rocks
+
+
+GENERATORS = {"dots": dots, "walls": walls, "maze": maze, "clutter": clutter}
+
+
+def generate(kind, size, seed):
+    rocks = GENERATORS[kind](size, size, numpy.random.RandomState(seed))
+
+    # keep the corner where the solver starts clear
+    clear = 2 * BALL_RADIUS + 4
+    rocks[:clear, :clear] = False
+    return rocks
+
+
+
+def timed(fn):
+    t = time.time()
+    result = fn()
+    return time.time() - t, result
+
+
+def bench_layout(kind, size, seed, ripple_steps):
+    """
+    timings in seconds for each stage on one generated layout, as a list of result dicts
+    """
+    rocks = generate(kind, size, seed)
+    table = TableModel(size, size, rock_map=RockMap.from_rockpoint(rocks))
+    results = []
+
+    def record(stage, seconds, **extra):
+        entry = {"layout": kind, "size": size, "seed": seed, "stage": stage, "seconds": seconds}
+        entry.update(extra)
+        results.append(entry)
+        print "%-8s %5d %-22s %8.3f s" % (kind, size, stage, seconds)
+
+    # templates are cached per process, so start from nothing
+    ball.templates_by_radius.clear()
+    seconds, b = timed(lambda: Ball(BALL_RADIUS))
+    record("ball_templates", seconds, radius=BALL_RADIUS)
+    contour_radius = BALL_RADIUS * 2 * NUM_CONTOURS + 1
+    seconds, _ = timed(lambda: Ball(contour_radius))
+    record("ball_templates", seconds, radius=contour_radius)
+
+    bs = BoustrophedonSolver(table, b)
+    seconds, _ = timed(bs.solve)
+    record("boustrophedon_solve", seconds, path_length=len(bs.path))
+
+    cs = ContourSolver(table, b, bs.is_rockpoint)
+    reachable = bs.get_reachable_list()
+    seconds, _ = timed(lambda: cs.solve(reachable, NUM_CONTOURS))
+    record("contour_solve", seconds, contours=len(cs.contours))
+
+    # the labeling pass, on the points the band method would pick out
+    field = cs.proximity_map.field
+    with numpy.errstate(invalid="ignore"):
+        band = field % (BALL_RADIUS * 2)
+        is_contour = (1 <= band) & (band <= 1.71)
+    seconds, labeled = timed(lambda: cs.get_contiguous_contours(is_contour))
+    record("get_contiguous_contours", seconds, points=int(numpy.count_nonzero(is_contour)), contours=len(labeled))
+
+    bg = LinearBackground(table, b)
+    seconds, _ = timed(lambda: bg.solve(bs.reachable, cs.foreground))
+    record("background_solve", seconds, segments=len(bg.segments))
+
+    if ripple_steps:
+        rip = SandRipple(size, size)
+        seconds, _ = timed(lambda: [rip.iterate(20.0, 0.5, 0.0, 0.0, 0.1, 0.8, 0, 1)
+                                    for i in range(ripple_steps)])
+        record("sand_ripple_step", seconds / ripple_steps, steps=ripple_steps)
+
+    return results
+
+
+def compare(previous, current):
+    """
+    print how each stage's time changed since a previous run's results
+    """
+    key = lambda r: (r["layout"], r["size"], r["stage"], r.get("radius"))
+    before = dict((key(r), r["seconds"]) for r in previous["results"])
+    for r in current["results"]:
+        old = before.get(key(r))
+        if old is None: continue
+        ratio = r["seconds"] / old if old > 0 else float("inf")
+        flag = "  SLOWER" if ratio > 1.2 and r["seconds"] - old > 0.01 else ""
+        print "%-8s %5d %-22s %8.3f -> %8.3f s  x%.2f%s" % (r["layout"], r["size"], r["stage"],
+                                                            old, r["seconds"], ratio, flag)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Time each solver stage on generated rock layouts")
+    parser.add_argument("output", help="where to write the JSON results")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="table sizes (square)")
+    parser.add_argument("--layouts", nargs="+", choices=sorted(GENERATORS), default=sorted(GENERATORS))
+    parser.add_argument("--seed", type=int, default=1, help="seed for the layout generators")
+    parser.add_argument("--ripple-steps", type=int, default=3, help="sand ripple steps to time (0 to skip)")
+    parser.add_argument("--compare", metavar="JSON", help="earlier results to compare against")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        for kind in args.layouts:
+            results += bench_layout(kind, size, args.seed, args.ripple_steps)
+
+    run = {
+        "meta": {
+            "time":     time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python":   platform.python_version(),
+            "numpy":    numpy.__version__,
+            "platform": platform.platform(),
+            "seed":     args.seed,
+            },
+        "results": results,
+        }
+    with open(args.output, "w") as f:
+        json.dump(run, f, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), run)
+
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,7 +1,12 @@
 
-from sensor import DisplacementSensor, DisplacementError
-from a_star import AStar
-import ball
+from sensor import DisplacementSensor
+from a_star import AStar, GridAStar
+from jump_point_search import JumpPointSearch
+from cell_decomposition import CellDecomposition
+from path_optimizer import PathOptimizer
+from path_animator import PathAnimator
+from rock_map import RockMap
+import numpy
 
 DEBUG = False
 
@@ -12,87 +17,119 @@ class BoustrophedonSolver(object):
         self.table = table
         self.ball = ball
         self.radius = self.ball.radius
-        self.canvas = table.drawing_area
+        self.canvas = table.get_drawing_area()
         self.sensor = DisplacementSensor(ball, DEBUG)
         self.covered = None
         self.visited = None
         self.path = None
+        self.planner = None
+        self.jump_planner = None
+        self.planner_name = "grid"  # transit planner for cover_xytable: "grid", "jps" or "astar"
+        self.coverage_mode = "flood" # "flood" for cover_xytable, "cells" for cover_cells
+        self.cells = []
+        self.rock_map = None  # rockpoint, when it's a RockMap shared with the table
+        self.progress = None  # something with report(phase, **counts), e.g. a solve_worker.Progress
+        self.animator = None
 
 
     def reset(self):
-        self.covered_first_point = False
-        self.covered = [[False for y in col] for col in self.rockpoint]
-        self.visited = [[False for y in col] for col in self.rockpoint]
+        w, h = len(self.rockpoint), len(self.rockpoint[0])
+
+        # visited shares its memory with a flat bytearray that the grid planners read directly
+        self.visited_flat = bytearray(w * h)
+        self.visited = numpy.frombuffer(self.visited_flat, dtype=bool).reshape(w, h)
+        self.covered = numpy.zeros((w, h), dtype=bool)
+        self.visited_list = None
+
+        # the centers the ball can get to, for planning transits and for the later stages.
+        # the flood goes everywhere it can, so there that's just visited
+        if "cells" == self.coverage_mode:
+            self.reachable_flat = bytearray(w * h)
+            self.reachable = numpy.frombuffer(self.reachable_flat, dtype=bool).reshape(w, h)
+        else:
+            self.reachable_flat, self.reachable = self.visited_flat, self.visited
+        self.reachable_list = None
+        self.covered_list = None
         self.path = []
+        self.reported_steps = 0
+
+        # the ball as a boolean mask, for stamping coverage in one go (shared, read-only)
+        self.coverage_mask = self.ball.mask
+
+        # grid planners are reusable, so only make new ones when the table size changes
+        if self.planner is None or (self.planner.width, self.planner.height) != (w, h):
+            self.planner = GridAStar(w, h)
+            self.jump_planner = JumpPointSearch(w, h)
 
 
     def is_covered(self, point):
         x, y = point
-        return self.covered[x][y]
+        return self.covered[x, y]
 
     def is_visited(self, point):
         x, y = point
-        return self.visited[x][y]
+        return self.visited[x, y]
 
+    # the (x, y) points as a list.  it's cached until the next change, so don't modify it
     def get_visited_list(self):
-        ret = []
-        for x, row in enumerate(self.visited):
-            for y, is_visited in enumerate(row):
-                if is_visited:
-                    ret.append((x, y))
-        return ret
+        if self.visited_list is None:
+            xs, ys = numpy.nonzero(self.visited)
+            self.visited_list = zip(xs.tolist(), ys.tolist())
+        return self.visited_list
+
+    def get_reachable_list(self):
+        if self.reachable is self.visited:
+            return self.get_visited_list()
+        if self.reachable_list is None:
+            xs, ys = numpy.nonzero(self.reachable)
+            self.reachable_list = zip(xs.tolist(), ys.tolist())
+        return self.reachable_list
 
     def get_covered_list(self):
-        ret = []
-        for x, row in enumerate(self.covered):
-            for y, is_visited in enumerate(row):
-                if is_visited:
-                    ret.append((x, y))
-        return ret
+        if self.covered_list is None:
+            xs, ys = numpy.nonzero(self.covered)
+            self.covered_list = zip(xs.tolist(), ys.tolist())
+        return self.covered_list
 
 
     def visit_point(self, x, y):
-        try:
-            d = self.sensor.displacement(x, y)
-            if (0, 0) != d:
-                # we have detected a rock
-                return False
-
-            # else no rock exists at this location
-            self.visited[x][y] = True
-
-            # update info on where we "went"
-            self.path.append((x, y, True))
-
-            # mark points underneath ball as covered
-            # use full coverage the first time, but all other times we can just cover the shell
-            if self.covered_first_point:
-                coverage = self.ball.shell(x, y)
-            else:
-                self.covered_first_point = True
-                coverage = self.ball.coverage(x, y)
-
-            for xc, yc in coverage:
-                self.covered[xc][yc] = True
-        except DisplacementError:
-            print "DISPLACEMENT ERROR"
+        if self.sensor.is_blocked(x, y):
+            # we have detected a rock
             return False
-        except IndexError:
-            print "failed", xc, yc
-            raise
-        except:
-            raise
 
+        # else no rock exists at this location
+        self.visited[x, y] = True
+        self.visited_list = None
+
+        # update info on where we "went"
+        self.path.append((x, y, True))
+
+        self.cover_point(x, y)
         return True
 
 
+    # mark points underneath ball as covered, optionally only those in (wx0, wy0, wx1, wy1)
+    def cover_point(self, x, y, window=None):
+        rr = self.radius - 1
+        wx0, wy0, wx1, wy1 = window or (0, 0) + self.covered.shape
+
+        # clip the ball's mask to the table
+        x0, x1 = max(wx0, x - rr), min(wx1, x + rr + 1)
+        y0, y1 = max(wy0, y - rr), min(wy1, y + rr + 1)
+        if x0 >= x1 or y0 >= y1: return
+
+        mask = self.coverage_mask[x0 - (x - rr):x1 - (x - rr), y0 - (y - rr):y1 - (y - rr)]
+        self.covered[x0:x1, y0:y1] |= mask
+        self.covered_list = None
+
+
     def is_ball_contained(self, x, y):
         lo = self.radius - 1
-        hi = len(self.rockpoint) - self.radius
+        w, h = self.covered.shape  # the table needn't be square
         if x < lo: return False
-        if x > hi: return False
+        if x > w - self.radius: return False
         if y < lo: return False
-        if y > hi: return False
+        if y > h - self.radius: return False
         return True
 
     # use fake omnipotent algorithm to exercise coverage algorithm
@@ -140,6 +177,8 @@ class BoustrophedonSolver(object):
     # where position is (x, y)
     def cover_xytable(self):
         total_distance = 0
+        planner_calls = 0
+        reported_distance = 0
 
         flood_covered = [[False for y in col] for col in self.rockpoint]
 
@@ -167,21 +206,33 @@ class BoustrophedonSolver(object):
                 if flood_covered[x][y]: continue
                 flood_covered[x][y] = True
 
-                # set up the path planner, from the new point back to the current point
-                # AStar(cost_fn, is_goal_fn, h_fn, successors_fn)
-                cost_fn = lambda _, __  : 1
-                h_fn = lambda (x, y) : abs(x - x0) + abs(y - y0) # manhattan distance
-                is_goal_fn = lambda path : path == current_location
-                successors_fn = lambda node : [n
-                                               for n in get_neighbors(node)
-                                               if (self.is_visited(n)
-                                                   or n == current_location
-                                                   or n == new_loc)]
-
-                path_planner = AStar(cost_fn, is_goal_fn, h_fn, successors_fn, self.hack_draw_planned_path)
-
-                # steps to get us to new location
-                current_to_new_location = path_planner.solve(new_loc)
+                if self.planner_name in ("grid", "jps"):
+                    # steps to get us to new location, only through places we've already been.
+                    # jump point search pays off on long back-tracks, but its scans cost more
+                    # than plain A* on the short hops that make up most of the flood
+                    planner = self.planner
+                    if "jps" == self.planner_name and abs(x - x0) + abs(y - y0) >= 2 * self.radius:
+                        planner = self.jump_planner
+                    current_to_new_location = planner.solve(current_location, new_loc, self.visited_flat)
+                    planner_calls += 1
+                else:
+                    # set up the path planner, from the new point back to the current point
+                    # AStar(cost_fn, is_goal_fn, h_fn, successors_fn)
+                    cost_fn = lambda _, __  : 1
+                    h_fn = lambda (x, y) : abs(x - x0) + abs(y - y0) # manhattan distance
+                    is_goal_fn = lambda path : path == current_location
+                    successors_fn = lambda node : [n
+                                                   for n in get_neighbors(node)
+                                                   if (self.is_visited(n)
+                                                       or n == current_location
+                                                       or n == new_loc)]
+
+                    path_planner = AStar(cost_fn, is_goal_fn, h_fn, successors_fn, self.hack_draw_planned_path)
+
+                    # steps to get us to new location
+                    current_to_new_location = path_planner.solve(new_loc)
+                    planner_calls += 1
+
                 if current_to_new_location is None:
                     self.draw_pathplan_failure(current_location, new_loc)
                     raise AssertionError("Couldn't go from " + str(current_location) + " to " + str(new_loc))
@@ -200,6 +251,10 @@ class BoustrophedonSolver(object):
             # we've arrived
             current_location = new_loc
             total_distance += 1
+            # transits move total_distance on by more than one step at a time
+            if self.progress is not None and total_distance - reported_distance >= 500:
+                self.report_progress(planner_calls)
+                reported_distance = total_distance
 
             # add new neighbors to the list of places we need to check
             for neighbor in get_neighbors(new_loc):
@@ -212,27 +267,223 @@ class BoustrophedonSolver(object):
         print "which has % efficiency", round(100.0 * len(self.get_visited_list()) / total_distance, 1)
 
 
+    # let whoever is watching know how far along we are, and show the path so far
+    def report_progress(self, planner_calls):
+        self.progress.report("coverage", visited=numpy.count_nonzero(self.visited), planner_calls=planner_calls,
+                             path=len(self.path))
+        start = self.reported_steps if 0 < self.reported_steps <= len(self.path) else 0
+        self.draw_points([(x, y) for (x, y, e) in self.path[start:]], "green")
+        self.table.flush()
+        self.reported_steps = len(self.path)
+
+
+    # sweep the free space in lanes, one boustrophedon cell at a time
+    def cover_cells(self):
+        # lanes one ball coverage width apart
+        rr = self.radius - 1
+        start = (self.radius + 1, self.radius + 1)
+        decomposition = CellDecomposition(self.free_centers())
+        self.cells = decomposition.cells
+        self.path = decomposition.coverage_path(start, 2 * rr + 1, self.planner, progress=self.progress)
+
+        self.reachable[:, :] = decomposition.reachable_mask(start)
+        self.reachable_list = None
+        self.cover_path()
+
+        print "Total distance is", max(0, len(self.path) - 1), "over", len(self.cells), "cells,",
+        print "covering", len(self.get_covered_list()), "points"
+
+
+    # visited and covered from scratch, as where the path's centers go and what the ball
+    # sweeps over there.  for cells mode, whose transits go through any free space
+    def cover_path(self):
+        self.visited[:, :] = False
+        self.covered[:, :] = False
+        self.visited_list = None
+        self.covered_list = None
+        for (x, y, exploratory) in self.path:
+            self.visited[x, y] = True
+            self.cover_point(x, y)
+
+
+    # centers where the ball fits on the table without touching a rock
+    def free_centers(self):
+        rr = self.radius - 1
+        w, h = len(self.rockpoint), len(self.rockpoint[0])
+        free = ~self.sensor.obstacle_map
+        free[:rr] = False
+        free[w - rr:] = False
+        free[:, :rr] = False
+        free[:, h - rr:] = False
+        return free
+
+
+    def update(self):
+        """
+        catch up with the rocks drawn since the last solve, without solving from scratch
+
+        only the obstacle map around the drawn region is recomputed.  new rocks can only take
+        away places the ball can go, so reachable and visited shrink to what's still
+        reachable.  in flood mode the path drops the points it lost and re-plans the
+        transits across the gaps, and covered is redone around them; in cells mode the
+        cells around the change are swept again (see resweep).  returns the list of points
+        that are no longer reachable (in flood mode, no longer visited), or None if this
+        had to fall back to a full solve (nothing solved yet, or rocks were taken away)
+        """
+        region = self.table.take_dirty_region()
+        if region is None: return []
+        if self.visited is None:
+            self.solve()
+            return None
+
+        x0, y0, x1, y1 = region
+        if self.rock_map is None:
+            rocks = self.table.get_rock_region(x0, y0, x1, y1)
+            for x in range(x0, x1):
+                self.rockpoint[x][y0:y1] = rocks[x - x0].tolist()
+
+        (bx0, by0, bx1, by1), before = self.sensor.update_obstacle_map(self.rockpoint, x0, y0, x1, y1)
+        if (before & ~self.sensor.obstacle_map[bx0:bx1, by0:by1]).any():
+            self.solve()
+            return None
+
+        # a new rock can also cut off space far away from it
+        start = (self.radius + 1, self.radius + 1)
+        decomposition = CellDecomposition(self.free_centers())
+        reachable = decomposition.reachable_mask(start)
+        removed = self.reachable & ~reachable
+        xs, ys = numpy.nonzero(removed)
+        if 0 == len(xs): return []
+
+        self.visited &= reachable
+        self.visited_list = None
+        self.reachable &= reachable
+        self.reachable_list = None
+
+        if "cells" == self.coverage_mode:
+            self.resweep(decomposition, (bx0, by0, bx1, by1))
+        else:
+            self.repair_path()
+
+            # redo coverage wherever a removed point's ball reached
+            rr = self.radius - 1
+            w, h = self.covered.shape
+            window = (max(0, xs.min() - rr), max(0, ys.min() - rr),
+                      min(w, xs.max() + rr + 1), min(h, ys.max() + rr + 1))
+            wx0, wy0, wx1, wy1 = window
+            self.covered[wx0:wx1, wy0:wy1] = False
+            self.covered_list = None
+            for (x, y, exploratory) in self.path:
+                if wx0 - rr <= x < wx1 + rr and wy0 - rr <= y < wy1 + rr:
+                    self.cover_point(x, y, window)
+
+        print "Updated", len(xs), "visited points, path is now", len(self.path), "steps"
+        return zip(xs.tolist(), ys.tolist())
+
+
+    def resweep(self, decomposition, region):
+        """
+        cells mode: sweep again where the obstacle map changed in region
+
+        the path through the old cells that overlap region is dropped, the rest is stitched
+        back together, and the new cells (from decomposition) over that same ground are
+        swept after it.  visited and covered are redone from the new path
+        """
+        dropped = numpy.zeros_like(self.reachable)
+        for cell in self.cells:
+            if cell.overlaps(*region):
+                cell.paint(dropped)
+
+        start = (self.radius + 1, self.radius + 1)
+        todo = [i for i in decomposition.reachable_cells(start) if decomposition.cells[i].intersects(dropped)]
+
+        # the transits get planned again anyway, over the free space as it is now
+        self.path = [step for step in self.path
+                     if step[2] and self.reachable[step[0], step[1]] and not dropped[step[0], step[1]]]
+        self.repair_path()
+
+        here = self.path[-1][:2] if self.path else start
+        sweeps = decomposition.coverage_path(here, 2 * (self.radius - 1) + 1, self.planner, todo,
+                                              self.progress)
+        self.path += sweeps[1:] if self.path else sweeps
+        self.cells = decomposition.cells
+        self.cover_path()
+
+
+    # drop path points that aren't visited any more, and plan transits across the gaps
+    def repair_path(self):
+        path = []
+        for step in self.path:
+            x, y = step[:2]
+            if not self.visited[x, y]: continue
+            if path:
+                here = path[-1][:2]
+                if here == (x, y): continue
+                if 1 < abs(x - here[0]) + abs(y - here[1]):
+                    transit = self.planner.solve(here, (x, y), self.reachable_flat)
+                    if transit is None:
+                        raise AssertionError("Couldn't go from " + str(here) + " to " + str((x, y)))
+                    path += [(tx, ty, False) for (tx, ty) in transit[1:-1]]
+            path.append(step)
+        self.path = path
+
+
+    # reorder the exploratory parts of the path to cut down on back-tracking
+    def optimize_path(self):
+        optimizer = PathOptimizer(self.planner, self.reachable_flat)
+        self.path = optimizer.optimize(self.path)
+        if "cells" == self.coverage_mode:
+            self.cover_path()
+        return (optimizer.before, optimizer.after)
+
+
     def solve(self):
 
+        self.table.take_dirty_region()
         self.rockpoint = self.table.get_rockpoint()
+        self.rock_map = self.rockpoint if isinstance(self.rockpoint, RockMap) else None
         self.sensor.set_rockpoint_fn(self.is_rockpoint)
+        self.sensor.build_obstacle_map(self.rockpoint)
         self.reset()
 
         #self.cover_bogo()
         #self.cover_floodfill()
-        self.cover_xytable()
+        if "cells" == self.coverage_mode:
+            self.cover_cells()
+        else:
+            self.cover_xytable()
 
 
 
 
+    # take a solution from elsewhere (e.g. a cache) instead of solving
+    def restore(self, path, visited, covered):
+        self.table.take_dirty_region()
+        self.rockpoint = self.table.get_rockpoint()
+        self.rock_map = self.rockpoint if isinstance(self.rockpoint, RockMap) else None
+        self.sensor.set_rockpoint_fn(self.is_rockpoint)
+        self.sensor.build_obstacle_map(self.rockpoint)
+        self.reset()
+
+        self.visited[:, :] = visited
+        self.covered[:, :] = covered
+        self.path = path
+        if "cells" == self.coverage_mode:
+            start = (self.radius + 1, self.radius + 1)
+            self.reachable[:, :] = CellDecomposition(self.free_centers()).reachable_mask(start)
+
+
     # whether a point is in the bounds of the table
     def is_in_bounds(self, point):
         x, y = point
-        return 0 <= x < len(self.rockpoint) and 0 <= y < len(self.rockpoint)
+        w, h = self.covered.shape
+        return 0 <= x < w and 0 <= y < h
 
     # whether a point is a rock
     def is_rockpoint(self, point):
         x, y = point
+        if self.rock_map is not None:
+            return self.rock_map.is_rock(x, y)
         col = self.rockpoint[x]
         if y >= len(col): return True
         return col[y]
@@ -241,68 +492,53 @@ class BoustrophedonSolver(object):
     def draw_point(self, x, y, color="black"):
         self.table.draw_point(x, y, color)
 
+    def draw_points(self, points, color="black"):
+        self.table.draw_points(points, color)
+
 
     # show point a, point b, and the visited places
     def draw_pathplan_failure(self, p1, p2):
-        for p in self.get_visited_list():
-            self.draw_point(p[0], p[1], "black")
-
-        self.draw_point(p1[0], p1[1], "yellow")
-        self.draw_point(p2[0], p2[1], "yellow")
+        self.draw_points(self.get_visited_list(), "black")
+        self.draw_points([p1, p2], "yellow")
 
 
     def show_visited_points(self):
-        for p in self.get_visited_list():
-            self.draw_point(p[0], p[1], "green")
-        self.canvas.update_idletasks()
+        self.draw_points(self.get_visited_list(), "green")
+        self.table.flush()
 
     def show_covered_points(self):
-        for p in self.get_covered_list():
-            self.draw_point(p[0], p[1], "yellow")
-        self.canvas.update_idletasks()
+        self.draw_points(self.get_covered_list(), "yellow")
+        self.table.flush()
 
     def stop_animating(self):
-        self.keep_animating = False
-
+        if self.animator is not None:
+            self.animator.stop()
+            self.animator = None
 
-    def animate_path(self, speed=1):
-        self.keep_animating = True
-        self.path_to_animate = self.path[:]
 
-        for i, (x, y, exploratory) in enumerate(self.path_to_animate):
-
-            coverage = ball.shell(x, y, self.sensor.ball_shell_template)
-            
-            for xc, yc in coverage:
-                self.draw_point(xc, yc, "yellow")
-                
-                if exploratory:
-                    self.draw_point(x, y, "green")
-                else:
-                    self.draw_point(x, y, "black")
-
-            # only animate sometimes, to speed things up
-            if 0 == (i % speed): 
-                self.canvas.update_idletasks()
-
-        self.canvas.update_idletasks()
+    def animate_path(self, steps_per_second=None, fps=30, table=None):
+        """
+        play the path back on table (this solver's table by default) from its Tk loop, and
+        return right away.  see path_animator.PathAnimator
+        """
+        self.stop_animating()
+        self.animator = PathAnimator(table or self.table, self.ball, self.path, fps=fps,
+                                     steps_per_second=steps_per_second)
+        self.animator.start()
+        return self.animator
 
 
 
     def hack_draw_planned_path(self, p1, p2, plan):
         print "drawing visited list...",
-        for (x, y) in self.get_visited_list():
-            self.draw_point(x, y, "black")
+        self.draw_points(self.get_visited_list(), "black")
         print "done"
 
-        for (x, y) in plan:
-            self.draw_point(x, y, "blue")
-
-        for (x, y) in [p1, p2]:
-            self.draw_point(x, y, "green")
+        self.draw_points(plan, "blue")
+        self.draw_points([p1, p2], "green")
 
         print "updateing idletasks...",
-        self.canvas.update_idletasks()
+        self.table.flush()
         print "done"
 
 
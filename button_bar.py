@@ -1,5 +1,5 @@
 from Tkinter import Tk, Canvas, RIGHT, BOTH, RAISED
-from ttk import Frame, Button, Style
+from ttk import Frame, Button, Label, Style
 
 
 class ButtonBar(Frame):
@@ -29,8 +29,14 @@ class ButtonBar(Frame):
         rs_button.pack(side=RIGHT)
         rs_button.bind("<ButtonRelease-1>", self.h_rst)
 
+        self.status = Label(self, text="")
+        self.status.pack(side=RIGHT, padx=5)
+
         self.pack(fill=BOTH, expand=False)
 
+    def set_status(self, text):
+        self.status.configure(text=text)
+
     def h_close(self, event):
         self.parent.destroy()
 
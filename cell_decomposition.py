@@ -0,0 +1,261 @@
+
+import numpy
+
+
+def column_runs(free):
+    """
+    for each column x of a 2D boolean array, the list of (lo, hi) runs of True in y, inclusive
+    """
+    w, h = free.shape
+    padded = numpy.zeros((w, h + 2), dtype=numpy.int8)
+    padded[:, 1:-1] = free
+    edges = numpy.diff(padded, axis=1)
+
+    sx, sy = numpy.nonzero(1 == edges)
+    ex, ey = numpy.nonzero(-1 == edges)
+
+    runs = [[] for x in range(w)]
+    for x, lo, hi in zip(sx.tolist(), sy.tolist(), (ey - 1).tolist()):
+        runs[x].append((lo, hi))
+    return runs
+
+
+class Cell(object):
+    """
+    a piece of free space spanning columns x0..x1 with exactly one (lo, hi) interval per
+    column, so it can be swept in straight lanes without running into anything
+    """
+
+    def __init__(self, index, x0):
+        self.index = index
+        self.x0 = x0
+        self.x1 = x0 - 1
+        self.intervals = []
+        self.neighbors = set()
+
+    def add_column(self, interval):
+        self.intervals.append(interval)
+        self.x1 += 1
+
+    def interval(self, x):
+        return self.intervals[x - self.x0]
+
+    def contains(self, x, y):
+        if not (self.x0 <= x <= self.x1): return False
+        lo, hi = self.interval(x)
+        return lo <= y <= hi
+
+    def overlaps(self, x0, y0, x1, y1):
+        # whether any of the cell is in x0 <= x < x1, y0 <= y < y1
+        for x in range(max(x0, self.x0), min(x1, self.x1 + 1)):
+            lo, hi = self.interval(x)
+            if lo < y1 and y0 <= hi: return True
+        return False
+
+    def intersects(self, mask):
+        return any(mask[x, lo:hi + 1].any() for x, (lo, hi) in enumerate(self.intervals, self.x0))
+
+    def paint(self, mask, value=True):
+        for x, (lo, hi) in enumerate(self.intervals, self.x0):
+            mask[x, lo:hi + 1] = value
+
+
+    def lanes(self, spacing):
+        """
+        the columns to sweep: every spacing columns, always including both ends
+        """
+        xs = range(self.x0, self.x1 + 1, spacing)
+        if xs[-1] != self.x1:
+            xs.append(self.x1)
+        return xs
+
+
+    def entries(self):
+        """
+        the four corners a sweep can start from: (x, y, from_left, from_low)
+        """
+        (llo, lhi), (rlo, rhi) = self.intervals[0], self.intervals[-1]
+        return [(self.x0, llo, True,  True),
+                (self.x0, lhi, True,  False),
+                (self.x1, rlo, False, True),
+                (self.x1, rhi, False, False)]
+
+
+    def sweep(self, spacing, from_left, from_low):
+        """
+        boustrophedon path over the cell as a list of adjacent (x, y) points
+
+        lanes are swept end to end in alternating directions.  moving to the next lane
+        follows the cell's boundary at that end, and before each lane is swept the ball
+        goes out along the boundary at the start end and back.  so every boundary point
+        gets visited, and the ball reaches into the columns between lanes at both ends
+        (and right up to the table edge), the same as a flood fill would
+        """
+        lanes = self.lanes(spacing)
+        if not from_left:
+            lanes.reverse()
+
+        x = lanes[0]
+        lo, hi = self.interval(x)
+        y = lo if from_low else hi
+        path = [(x, y)]
+        at_low = from_low
+
+        def walk_y(x, y, target):
+            step = 1 if target > y else -1
+            path.extend((x, yy) for yy in range(y + step, target + step, step))
+            return target
+
+        def follow_boundary(x, y, to_x, at_low):
+            step = 1 if to_x > x else -1
+            for nx in range(x + step, to_x + step, step):
+                nlo, nhi = self.interval(nx)
+                y = walk_y(x, y, max(y, nlo) if at_low else min(y, nhi))
+                path.append((nx, y))
+                x = nx
+                y = walk_y(x, y, nlo if at_low else nhi)
+            return x, y
+
+        for i, lane_x in enumerate(lanes):
+            if 0 < i:
+                # follow the boundary at this end over to the next lane
+                x, y = follow_boundary(x, y, lane_x, at_low)
+
+            if i + 1 < len(lanes):
+                # out along the boundary at this end to the next lane, and back the same way
+                mark = len(path)
+                follow_boundary(x, y, lanes[i + 1], at_low)
+                path.extend(reversed(path[mark - 1:-1]))
+
+            # sweep the lane to its other end
+            lo, hi = self.interval(x)
+            y = walk_y(x, y, hi if at_low else lo)
+            at_low = not at_low
+
+        return path
+
+
+
+class CellDecomposition(object):
+    """
+    boustrophedon cellular decomposition of a free-space bitmap indexed [x][y]
+
+    free space is scanned column by column.  a cell ends wherever an obstacle starts or
+    ends (a critical point): when a run of free space splits, merges, appears or vanishes
+    between one column and the next.  see Choset & Pignon, "Coverage Path Planning: The
+    Boustrophedon Cellular Decomposition"
+    """
+
+    def __init__(self, free):
+        self.free = numpy.asarray(free, dtype=bool)
+        self.width, self.height = self.free.shape
+        self.cells = []
+        self.decompose()
+
+
+    def decompose(self):
+        runs = column_runs(self.free)
+        self.cells = []
+
+        prev_runs = []
+        prev_cells = []
+        for x, col in enumerate(runs):
+            # which runs of the previous column each run touches, and vice versa
+            back = [[] for r in col]
+            fwd  = [[] for r in prev_runs]
+            i = 0
+            for j, (lo, hi) in enumerate(col):
+                while i < len(prev_runs) and prev_runs[i][1] < lo:
+                    i += 1
+                k = i
+                while k < len(prev_runs) and prev_runs[k][0] <= hi:
+                    back[j].append(k)
+                    fwd[k].append(j)
+                    k += 1
+
+            col_cells = []
+            for j, interval in enumerate(col):
+                if 1 == len(back[j]) and 1 == len(fwd[back[j][0]]):
+                    cell = prev_cells[back[j][0]]
+                else:
+                    # critical point: start a new cell next to whatever it touches
+                    cell = Cell(len(self.cells), x)
+                    self.cells.append(cell)
+                    for k in back[j]:
+                        cell.neighbors.add(prev_cells[k].index)
+                        prev_cells[k].neighbors.add(cell.index)
+                cell.add_column(interval)
+                col_cells.append(cell)
+
+            prev_runs = col
+            prev_cells = col_cells
+
+
+    def cell_at(self, x, y):
+        for cell in self.cells:
+            if cell.contains(x, y): return cell
+        return None
+
+
+    def reachable_cells(self, start):
+        """
+        indices of all cells connected to the one containing start
+        """
+        first = self.cell_at(*start)
+        if first is None: return set()
+
+        reached = set([first.index])
+        to_visit = [first.index]
+        while to_visit:
+            for n in self.cells[to_visit.pop()].neighbors:
+                if n not in reached:
+                    reached.add(n)
+                    to_visit.append(n)
+        return reached
+
+
+    def reachable_mask(self, start):
+        """
+        boolean array of all free points connected to start
+        """
+        mask = numpy.zeros_like(self.free)
+        for i in self.reachable_cells(start):
+            self.cells[i].paint(mask)
+        return mask
+
+
+    def coverage_path(self, start, spacing, planner, cells=None, progress=None):
+        """
+        sweep every cell reachable from start (or just the cell indices in cells), as a list
+        of (x, y, exploratory) starting at start
+
+        cells are taken greedily, nearest sweep corner first.  the moves between cells are
+        planned over free space with planner (see a_star.GridAStar) and are not exploratory.
+        progress, if given, hears about every cell (see solve_worker.Progress)
+        """
+        todo = self.reachable_cells(start) if cells is None else set(cells)
+        if not todo: return []
+
+        passable = bytearray(self.free.ravel().astype(numpy.uint8).tostring())
+        path = [(start[0], start[1], True)]
+        x, y = start
+        while todo:
+            if progress is not None:
+                progress.report("cells", cells_left=len(todo), path=len(path))
+            dist, index, entry = min((abs(ex - x) + abs(ey - y), i, (ex, ey, left, low))
+                                     for i in todo
+                                     for (ex, ey, left, low) in self.cells[i].entries())
+            todo.remove(index)
+            ex, ey, from_left, from_low = entry
+
+            if (ex, ey) != (x, y):
+                transit = planner.solve((x, y), (ex, ey), passable)
+                path += [(tx, ty, False) for (tx, ty) in transit[1:-1]]
+
+            sweep = self.cells[index].sweep(spacing, from_left, from_low)
+            if (ex, ey) == (x, y):
+                sweep = sweep[1:]
+            path += [(sx, sy, True) for (sx, sy) in sweep]
+            x, y = path[-1][:2]
+
+        return path
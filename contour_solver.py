@@ -1,101 +1,239 @@
 
-from sensor import ProximitySensor
-from ball import Ball
+from proximity_map import ProximityMap
+from marching_squares import isolines
+import array
+import numpy
 import sys
+import metrics
 
 DEBUG = False
 
 
+def contour_stats(contour):
+    # size and bounding box (x0, y0, x1, y1) of a contour, x1 and y1 exclusive as in overlaps()
+    xs = [x for (x, y) in contour]
+    ys = [y for (x, y) in contour]
+    return {"size": len(contour),
+            "bbox": (int(min(xs)), int(min(ys)), int(max(xs)) + 1, int(max(ys)) + 1)}
+
+
+def overlaps(a, b):
+    # whether two (x0, y0, x1, y1) boxes overlap
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
 class ContourSolver(object):
 
     def __init__(self, table, ball, is_rockpoint):
         self.table = table
         self.ball = ball
-        self.canvas = table.drawing_area
+        self.canvas = table.get_drawing_area()
         self.contours = []
         self.is_rockpoint = is_rockpoint
-        self.proximity_map = {}
+        self.proximity_map = None
+        self.foreground = None
+        self.contour_stats = []
+        self.num_contours = 0
+        self.method = "isolines" # "isolines" for traced polylines, "bands" for labeled pixel bands
+        self.progress = None  # something with check(), e.g. a solve_worker.Progress
 
     def solve(self, visited, num_contours):
-        # initialize the proximity sensor
-        max_prox = (self.ball.radius * 2 * num_contours) + 1
-        proxball = Ball(max_prox)
-        ps = ProximitySensor(proxball, False)
-        ps.set_rockpoint_fn(self.is_rockpoint)
-        visited_hash = dict([(x, True) for x in visited]) # whitelist for prox sensor
-        self.proximity_map = {}
-        
-        fudge = 0.71 # 1 / sqrt(2)
+        self.solve_field(visited, num_contours)
+        self.trace_contours()
 
-        # collect all contour points
-        all_contour_points = []
-        for i, (x, y) in enumerate(visited):
-            prox = ps.proximity(x, y, visited_hash)
-            self.proximity_map[(x, y)] = prox
-            if prox is None: continue
 
-            if 1 <= (prox % (self.ball.radius * 2)) <= (1 + fudge):
-                color = "black"
-                all_contour_points.append((x, y))
-            else:
-                norm_prox = min(128, int(prox / max_prox * 128))
-                color = "#00%02X%02X" % (127 + norm_prox, 255 - norm_prox)
+    def update(self, blocked_points):
+        """
+        catch up with points that are no longer visited
+
+        returns the (x0, y0, x1, y1) region of the proximity field that changed, or None
+        """
+        region = self.update_field(blocked_points)
+        if region is not None:
+            self.retrace_contours(region)
+        return region
+
+
+    def restore(self, contours, foreground, num_contours):
+        """
+        take contours from elsewhere (e.g. a cache) instead of solving
 
-            #self.table.draw_point(x, y, color)
+        there's no proximity map afterwards, so update() needs a solve first
+        """
+        self.num_contours = num_contours
+        self.proximity_map = None
+        self.foreground = foreground
+        self.contours = contours
+        self.contour_stats = [contour_stats(c) for c in contours]
 
-        self.contours = self.get_contiguous_contours(all_contour_points)
 
-        
-            
-    def get_contiguous_contours(self, all_points):
-        print "looking for contiguous contours in", len(all_points), "points"
-        contour_point_visited = dict([(p, False) for p in all_points])
+    def solve_field(self, visited, num_contours):
+        # proximity of every visited point, out to the farthest contour
+        max_prox = (self.ball.radius * 2 * num_contours) + 1
+        self.num_contours = num_contours
+        self.proximity_map = ProximityMap(self.table.table_width, self.table.table_height, visited)
+        self.proximity_map.check = self.check
+        field = self.proximity_map.solve(max_prox)
+
+        # everywhere close enough to a rock to be in reach of the contours
+        self.foreground = ~numpy.isnan(field)
+
+
+    def update_field(self, blocked_points):
+        # the proximity map only recomputes around the points
+        self.proximity_map.check = self.check
+        region = self.proximity_map.update(blocked_points=blocked_points)
+        if region is None: return None
+
+        x0, y0, x1, y1 = region
+        field = self.proximity_map.field
+        self.foreground[x0:x1, y0:y1] = ~numpy.isnan(field[x0:x1, y0:y1])
+        return region
+
+
+    # a point where a solve that's being watched can be stopped
+    def check(self):
+        if self.progress is not None:
+            self.progress.check()
+
+
+    def trace_contours(self):
+        field = self.proximity_map.field
+        if "isolines" != self.method:
+            self.contours = self.trace_bands(field)
+            return
+
+        self.contours = self.trace_isolines(field, self.num_contours)
+        self.contour_stats = [contour_stats(c) for c in self.contours]
+        print "traced", len(self.contours), "contours with", sum(len(c) for c in self.contours), "points"
+
+
+    def retrace_contours(self, region):
+        """
+        trace the contours again after the proximity field changed in region
+
+        only the contours that pass near the change are retraced, over a window that takes
+        in all of them
+        """
+        field = self.proximity_map.field
+        if "isolines" != self.method:
+            self.contours = self.trace_bands(field)
+            return
+
+        # a contour through the changed region can run on into the unchanged part, but only
+        # along the old contours that came through it
+        x0, y0, x1, y1 = region
+        near = (x0 - 2, y0 - 2, x1 + 2, y1 + 2)
+        kept = []
+        wx0, wy0, wx1, wy1 = near
+        for c, stats in zip(self.contours, self.contour_stats):
+            bx0, by0, bx1, by1 = stats["bbox"]
+            if overlaps(stats["bbox"], near):
+                wx0, wy0, wx1, wy1 = min(wx0, bx0), min(wy0, by0), max(wx1, bx1), max(wy1, by1)
+            else:
+                kept.append(c)
+
+        w, h = field.shape
+        wx0, wy0, wx1, wy1 = max(0, wx0 - 1), max(0, wy0 - 1), min(w, wx1 + 1), min(h, wy1 + 1)
+        traced = self.trace_isolines(field[wx0:wx1, wy0:wy1], self.num_contours, (wx0, wy0),
+                                     numpy.nanmax(field) if self.foreground.any() else 0)
+        retraced = [c for c in traced if overlaps(contour_stats(c)["bbox"], near)]
+
+        self.contours = kept + retraced
+        self.contour_stats = [contour_stats(c) for c in self.contours]
+        print "retraced", len(retraced), "of", len(self.contours), "contours"
+
+
+    def trace_isolines(self, field, num_contours, origin=(0, 0), field_max=None):
+        """
+        ordered polylines where the proximity field crosses 1, 1 + d, 1 + 2d, ... (d = ball diameter)
+
+        these are the same offsets from the rocks that the bands pick out, but traced with
+        sub-pixel marching squares, so no fudge factor or labeling pass is needed.  field can
+        be part of the table starting at origin, with field_max the largest value on the whole
+        table, so that the lines come out the same as tracing everything
+        """
+        if field_max is None:
+            field_max = numpy.nanmax(field) if not numpy.isnan(field).all() else 0
+        if metrics.enabled: metrics.count("field_cells_scanned", field.size)
+
+        diameter = self.ball.radius * 2
+        ox, oy = origin
         all_contours = []
+        for k in range(num_contours):
+            level = 1 + k * diameter
+            for c in isolines(field, level, max(level, field_max) + 1, self.check):
+                all_contours.append([(x + ox, y + oy) for (x, y) in c])
+        return all_contours
 
-        def get_first_free_point():
-            for (p, v) in contour_point_visited.iteritems():
-                if not v: return p
-            return None
-
-        def get_neighbors(p):
-            (x0, y0) = p
-            neighbors = [
-                (x0 + 1, y0),
-                (x0 - 1, y0),
-                (x0,     y0 + 1),
-                (x0,     y0 - 1),
-                (x0 + 1, y0 + 1),
-                (x0 + 1, y0 - 1),
-                (x0 - 1, y0 + 1),
-                (x0 - 1, y0 - 1),
-                ]
-            return [n for n in neighbors if n in contour_point_visited and not contour_point_visited[n]]
-
-        while True:
-            # pick first contour point in the list, explore its neighbors
-            p = get_first_free_point()
-            if p is None: break
-
-            contour_point_visited[p] = True
-            this_contour = [p]
-            to_visit = get_neighbors(p)
-
-            # when there are no more neighbors, add that list to all_contours
-            while 0 < len(to_visit):
-                p = to_visit.pop()
-                contour_point_visited[p] = True
-                this_contour.append(p)
-                new_neighbors = get_neighbors(p)
-                if new_neighbors is not None:
-                    to_visit += new_neighbors
-
-            all_contours.append(this_contour)
 
+    def trace_bands(self, field):
+        fudge = 0.71 # 1 / sqrt(2)
+        if metrics.enabled: metrics.count("field_cells_scanned", field.size)
+
+        # the contour points, as a mask
+        with numpy.errstate(invalid="ignore"):
+            band = field % (self.ball.radius * 2)
+            is_contour = (1 <= band) & (band <= (1 + fudge))
+
+        with metrics.timer("contour_labeling"):
+            return self.get_contiguous_contours(is_contour)
+
+
+    def get_contiguous_contours(self, is_contour):
+        """
+        group the points of a boolean contour mask indexed [x][y] into 8-connected components
+
+        one pass over the mask's points in raster order gives each point the label of an
+        already-seen neighbor, read from an integer label array, and merges labels with
+        union-find; a second pass collects the points by final label.  also fills in
+        self.contour_stats (see contour_stats)
+        """
+        w, h = is_contour.shape
+        xs, ys = numpy.nonzero(is_contour)  # x major, y minor: raster order already
+        print "looking for contiguous contours in", len(xs), "points"
+
+        # labels of the mask padded by one, flat, so the neighbors above and behind are
+        # always there to look at: -1 for no point
+        H = h + 2
+        label = array.array("i", [-1]) * ((w + 2) * H)
+        parent = []
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        points = zip(xs.tolist(), ys.tolist())
+        indices = [(x + 1) * H + y + 1 for (x, y) in points]
+        for n, i in enumerate(indices):
+            if 0 == n % 4096: self.check()
+            roots = set(find(l) for l in (label[i - H - 1], label[i - H], label[i - H + 1], label[i - 1])
+                        if -1 != l)
+            if roots:
+                l = min(roots)
+                for r in roots:
+                    parent[r] = l
+            else:
+                l = len(parent)
+                parent.append(l)
+            label[i] = l
+
+        all_contours = []
+        contour_of_root = {}
+        for p, i in zip(points, indices):
+            root = find(label[i])
+            if root not in contour_of_root:
+                contour_of_root[root] = len(all_contours)
+                all_contours.append([])
+            all_contours[contour_of_root[root]].append(p)
+
+        self.contour_stats = [contour_stats(c) for c in all_contours]
         return all_contours
-            
-            
+
+
 
     def draw_contours(self):
-        for i, c in enumerate(self.contours):
-            for (x, y) in c:
-                self.table.draw_point(x, y, "black")
+        for c in self.contours:
+            self.table.draw_points(numpy.rint(c), "black")
@@ -0,0 +1,74 @@
+
+import numpy
+
+INF = float("inf")
+
+
+def distance_transform(features, check=None):
+    """
+    exact euclidean distance from every cell of a 2D boolean array to the nearest True cell
+
+    this is the two-pass algorithm from Felzenszwalb & Huttenlocher, "Distance Transforms
+    of Sampled Functions": squared 1D distances down each column, then the lower envelope
+    of parabolas along each row.  both passes are linear in the number of cells.
+    cells with no feature anywhere come back as inf.  check, if given, is called before each
+    row of the second pass and can raise to stop
+    """
+    features = numpy.asarray(features, dtype=bool)
+    w, h = features.shape
+
+    # pass 1: distance along y to the nearest feature in the same column, all columns at once
+    g = numpy.empty((w, h))
+    last = numpy.full(w, INF)
+    for y in range(h):
+        last = numpy.where(features[:, y], 0, last + 1)
+        g[:, y] = last
+    last = numpy.full(w, INF)
+    for y in range(h - 1, -1, -1):
+        last = numpy.where(features[:, y], 0, last + 1)
+        g[:, y] = numpy.minimum(g[:, y], last)
+
+    # pass 2: combine along x, one row at a time
+    d2 = numpy.empty((w, h))
+    for y in range(h):
+        if check is not None: check()
+        d2[:, y] = lower_envelope((g[:, y] ** 2).tolist())
+
+    return numpy.sqrt(d2)
+
+
+def lower_envelope(f):
+    """
+    squared distance transform of a sampled 1D function: d(q) = min over p of (q - p)^2 + f(p)
+    """
+    n = len(f)
+    v = [0] * n          # locations of the parabolas in the lower envelope
+    z = [0.0] * (n + 1)  # boundaries between them
+    k = -1
+
+    for q in range(n):
+        fq = f[q]
+        if fq == INF: continue
+
+        s = -INF
+        while 0 <= k:
+            p = v[k]
+            s = ((fq + q * q) - (f[p] + p * p)) / (2.0 * (q - p))
+            if s > z[k]: break
+            k -= 1
+
+        k += 1
+        v[k] = q
+        z[k] = s if 0 < k else -INF
+        z[k + 1] = INF
+
+    if k < 0: return [INF] * n
+
+    d = [0.0] * n
+    k = 0
+    for q in range(n):
+        while z[k + 1] < q:
+            k += 1
+        p = v[k]
+        d[q] = (q - p) * (q - p) + f[p]
+    return d
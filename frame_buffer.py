@@ -0,0 +1,121 @@
+from Tkinter import PhotoImage, NW
+import numpy
+
+
+# "#rrggbb" as ascii, indexed by channel value
+HEX_DIGITS = numpy.array([list("%02x" % i) for i in range(256)], dtype="S1").view(numpy.uint8).reshape(256, 2)
+
+
+class FrameBuffer(object):
+    """
+    a single Tk image on a canvas, backed by a (width, height, 3) array of pixels
+
+    drawing only touches the array; the image is updated by flush(), which is
+    scheduled to happen once when the canvas next goes idle
+    """
+
+    def __init__(self, canvas, width, height, color="gray"):
+        self.canvas = canvas
+        self.width = width
+        self.height = height
+        self.pixels = numpy.zeros((width, height, 3), dtype=numpy.uint8)
+        self.colors = {}
+        self.dirty = None
+        self.flush_pending = False
+
+        self.image = PhotoImage(width=width, height=height)
+        self.canvas.create_image(0, 0, anchor=NW, image=self.image)
+        self.fill(color)
+
+
+    def rgb(self, color):
+        """
+        convert any Tk color to an (r, g, b) triple, remembering the answer
+        """
+        if color not in self.colors:
+            self.colors[color] = tuple(c >> 8 for c in self.canvas.winfo_rgb(color))
+        return self.colors[color]
+
+
+    def fill(self, color):
+        self.pixels[:, :] = self.rgb(color)
+        self.mark_dirty(0, 0, self.width - 1, self.height - 1)
+
+
+    def draw_point(self, x, y, color):
+        self.pixels[x, y] = self.rgb(color)
+        self.mark_dirty(x % self.width, y % self.height, x % self.width, y % self.height)
+
+
+    def draw_points(self, points, color):
+        """
+        draw a list of (x, y) points (or an (n, 2) array) all in one color
+
+        points outside the table are ignored
+        """
+        pts = numpy.asarray(points, dtype=int).reshape(-1, 2)
+        xs, ys = pts[:, 0], pts[:, 1]
+        inside = (0 <= xs) & (xs < self.width) & (0 <= ys) & (ys < self.height)
+        xs, ys = xs[inside], ys[inside]
+        if 0 == len(xs): return
+
+        self.pixels[xs, ys] = self.rgb(color)
+        self.mark_dirty(xs.min(), ys.min(), xs.max(), ys.max())
+
+
+    def blit(self, array):
+        """
+        replace the whole frame with an array indexed [x][y]
+
+        a 2D array is treated as gray levels, a 3D array as (r, g, b)
+        """
+        a = numpy.asarray(array)
+        if 2 == a.ndim:
+            a = a[:, :, numpy.newaxis]
+        self.pixels[:, :] = numpy.clip(a, 0, 255)
+        self.mark_dirty(0, 0, self.width - 1, self.height - 1)
+
+
+    def mark_dirty(self, x0, y0, x1, y1):
+        if self.dirty is None:
+            self.dirty = (x0, y0, x1, y1)
+        else:
+            dx0, dy0, dx1, dy1 = self.dirty
+            self.dirty = (min(x0, dx0), min(y0, dy0), max(x1, dx1), max(y1, dy1))
+
+        if not self.flush_pending:
+            self.flush_pending = True
+            self.canvas.after_idle(self.flush)
+
+
+    def flush(self):
+        """
+        push the dirty rectangle of the array to the image in a single call
+        """
+        self.flush_pending = False
+        if self.dirty is None: return
+
+        x0, y0, x1, y1 = self.dirty
+        self.dirty = None
+        self.image.put(self.photo_data(self.pixels[x0:x1 + 1, y0:y1 + 1]), to=(int(x0), int(y0)))
+
+
+    @staticmethod
+    def photo_data(pixels):
+        """
+        format an [x][y] pixel array as Tk photo data: "{#rrggbb #rrggbb ...} {...}", one row per y
+        """
+        rows = pixels.transpose(1, 0, 2)
+        h, w = rows.shape[:2]
+
+        cells = numpy.empty((h, w, 8), dtype=numpy.uint8)
+        cells[:, :, 0] = ord("#")
+        cells[:, :, 1:7] = HEX_DIGITS[rows].reshape(h, w, 6)
+        cells[:, :, 7] = ord(" ")
+
+        lines = numpy.empty((h, w * 8 + 2), dtype=numpy.uint8)
+        lines[:, 0] = ord("{")
+        lines[:, 1:-1] = cells.reshape(h, w * 8)
+        lines[:, -2] = ord("}")
+        lines[:, -1] = ord(" ")
+        return lines.tostring()
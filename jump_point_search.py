@@ -0,0 +1,156 @@
+import heapq
+import metrics
+
+INF = float("inf")
+
+
+class JumpPointSearch(object):
+    """
+    jump point search for 4-connected, unit cost moves on a width x height grid
+
+    same interface as a_star.GridAStar.  among equally short paths this only considers
+    "horizontal first" ones: a horizontal move may turn vertical at any cell, but a vertical
+    move only turns horizontal where a blocked cell forced it to.  so straight runs are
+    scanned without touching the heap, and only the jump points where something can change
+    are expanded.  paths are as short as A*'s; self.expansions counts the jump points expanded
+    """
+
+    def __init__(self, width, height):
+        self.width      = width
+        self.height     = height
+        self.g          = [INF] * (width * height)
+        self.parent     = [-1] * (width * height)
+        self.closed     = bytearray(width * height)
+        self.expansions = 0
+
+
+    # solve from start to goal, moving only through cells where passable[index] is true.
+    # start and goal are (x, y) and always allowed.  return [start, ..., goal] or None
+    def solve(self, start, goal, passable):
+        W = self.width
+        H = self.height
+        g = self.g
+        parent = self.parent
+        closed = self.closed
+
+        gx, gy = goal
+        src = start[0] * H + start[1]
+        dst = gx * H + gy
+
+        def free(x, y):
+            if x < 0 or x >= W or y < 0 or y >= H: return False
+            i = x * H + y
+            return i == dst or passable[i]
+
+        def jump_vertical(x, y, dy):
+            i = x * H + y
+            has_left = 0 < x
+            has_right = x < W - 1
+            while True:
+                y += dy
+                if y < 0 or y >= H: return -1
+                i += dy
+                if i == dst: return dst
+                if not passable[i]: return -1
+
+                # a horizontal neighbor we couldn't have reached by going horizontal first
+                j = i - H
+                if has_left and (passable[j] or j == dst) and not (passable[j - dy] or j - dy == dst):
+                    return i
+                j = i + H
+                if has_right and (passable[j] or j == dst) and not (passable[j - dy] or j - dy == dst):
+                    return i
+
+        def jump_horizontal(x, y, dx):
+            i = x * H + y
+            step = dx * H
+            while True:
+                x += dx
+                if x < 0 or x >= W: return -1
+                i += step
+                if i == dst: return dst
+                if not passable[i]: return -1
+
+                # every cell on a horizontal run may turn vertical, so look up and down the column
+                if -1 != jump_vertical(x, y, 1) or -1 != jump_vertical(x, y, -1):
+                    return i
+
+        g[src] = 0
+        parent[src] = -1
+        touched = [src]
+        h0 = abs(start[0] - gx) + abs(start[1] - gy)
+        frontier = [(h0, h0, src)]
+        self.expansions = 0
+        found = False
+        track = metrics.enabled
+        frontier_peak = 1
+
+        while frontier:
+            _, _, current = heapq.heappop(frontier)
+            if closed[current]: continue
+            if current == dst:
+                found = True
+                break
+
+            closed[current] = 1
+            self.expansions += 1
+            cx, cy = divmod(current, H)
+
+            # which directions to jump in depends on how we got here
+            if -1 == parent[current]:
+                jumps = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+            else:
+                px, py = divmod(parent[current], H)
+                if py == cy:
+                    dx = 1 if px < cx else -1
+                    jumps = [(dx, 0), (0, -1), (0, 1)]
+                else:
+                    dy = 1 if py < cy else -1
+                    jumps = [(0, dy)] + [(s, 0) for s in (-1, 1)
+                                         if free(cx + s, cy) and not free(cx + s, cy - dy)]
+
+            for (dx, dy) in jumps:
+                if 0 == dy:
+                    succ = jump_horizontal(cx, cy, dx)
+                else:
+                    succ = jump_vertical(cx, cy, dy)
+                if -1 == succ or closed[succ]: continue
+
+                nx, ny = divmod(succ, H)
+                new_g = g[current] + abs(nx - cx) + abs(ny - cy)
+                if new_g < g[succ]:
+                    if INF == g[succ]: touched.append(succ)
+                    g[succ] = new_g
+                    parent[succ] = current
+                    h = abs(nx - gx) + abs(ny - gy)
+                    heapq.heappush(frontier, (new_g + h, h, succ))
+                    if track and len(frontier) > frontier_peak: frontier_peak = len(frontier)
+
+        path = None
+        if found:
+            # fill in the straight runs between jump points
+            path = [(gx, gy)]
+            current = dst
+            while -1 != parent[current]:
+                x1, y1 = divmod(current, H)
+                x0, y0 = divmod(parent[current], H)
+                if y0 == y1:
+                    step = 1 if x1 < x0 else -1
+                    path += [(x, y1) for x in range(x1 + step, x0 + step, step)]
+                else:
+                    step = 1 if y1 < y0 else -1
+                    path += [(x1, y) for y in range(y1 + step, y0 + step, step)]
+                current = parent[current]
+            path.reverse()
+
+        # leave the arrays clean for the next search
+        for i in touched:
+            g[i] = INF
+            closed[i] = 0
+
+        if track:
+            metrics.count("jps_searches")
+            metrics.count("jps_expansions", self.expansions)
+            metrics.peak("jps_frontier", frontier_peak)
+
+        return path
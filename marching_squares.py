@@ -0,0 +1,89 @@
+
+import numpy
+
+
+# the two edges around each corner of a cell, for splitting saddles.
+# corners are a = (i, j), b = (i + 1, j), c = (i + 1, j + 1), d = (i, j + 1);
+# edges are 0 = a-b, 1 = b-c, 2 = d-c, 3 = a-d
+CORNER_EDGES = [(0, 3), (0, 1), (1, 2), (2, 3)]
+EDGE_CORNERS = [(0, 1), (1, 2), (3, 2), (0, 3)]
+
+
+def isolines(field, level, nan_value=None, check=None):
+    """
+    trace the lines where a 2D field (indexed [x][y]) crosses level, as ordered polylines
+
+    this is marching squares: each grid cell whose corners straddle the level gets a
+    segment between the interpolated crossings on its edges, and segments that share an
+    edge are joined.  closed loops end with their first point.  nan is taken as nan_value,
+    by default just above both level and the largest value in the field.  check, if given,
+    is called every so many cells and can raise to stop
+    """
+    f = numpy.asarray(field, dtype=float)
+    if numpy.isnan(f).any():
+        if nan_value is None:
+            nan_value = max(level, numpy.nanmax(f)) + 1 if not numpy.isnan(f).all() else level + 1
+        f = numpy.where(numpy.isnan(f), nan_value, f)
+
+    above = f >= level
+    case = (above[:-1, :-1] * 1 + above[1:, :-1] * 2 + above[1:, 1:] * 4 + above[:-1, 1:] * 8)
+    ci, cj = numpy.nonzero((0 < case) & (case < 15))
+
+    def edge_id(i, j, e):
+        # an edge shared by two cells gets the same id from both
+        if 0 == e: return (0, i, j)
+        if 1 == e: return (1, i + 1, j)
+        if 2 == e: return (0, i, j + 1)
+        return (1, i, j)
+
+    # each segment is a pair of edge ids
+    segments = []
+    for n, (i, j) in enumerate(zip(ci.tolist(), cj.tolist())):
+        if check is not None and 0 == n % 4096: check()
+        corners = [(i, j), (i + 1, j), (i + 1, j + 1), (i, j + 1)]
+        up = [above[p] for p in corners]
+        crossed = [e for e, (p, q) in enumerate(EDGE_CORNERS) if up[p] != up[q]]
+
+        if 2 == len(crossed):
+            pairs = [crossed]
+        else:
+            # saddle: cut off the corners that are on the other side from the cell's center
+            center_up = sum(f[p] for p in corners) / 4.0 >= level
+            pairs = [CORNER_EDGES[k] for k in range(4) if up[k] != center_up]
+
+        for (e0, e1) in pairs:
+            segments.append((edge_id(i, j, e0), edge_id(i, j, e1)))
+
+    def crossing(edge):
+        vertical, i, j = edge
+        i1, j1 = (i, j + 1) if vertical else (i + 1, j)
+        v0, v1 = float(f[i, j]), float(f[i1, j1])
+        t = (level - v0) / (v1 - v0)
+        return (i + t * (i1 - i), j + t * (j1 - j))
+
+    # join segments that share edges
+    touching = {}
+    for s, (e0, e1) in enumerate(segments):
+        touching.setdefault(e0, []).append(s)
+        touching.setdefault(e1, []).append(s)
+
+    used = [False] * len(segments)
+
+    def follow(edge):
+        line = [edge]
+        while True:
+            nxt = [s for s in touching[line[-1]] if not used[s]]
+            if not nxt: return line
+            s = nxt[0]
+            used[s] = True
+            e0, e1 = segments[s]
+            line.append(e1 if e0 == line[-1] else e0)
+
+    lines = []
+    # open lines first, starting from their loose ends, then whatever loops are left
+    ends = [e for e, segs in touching.iteritems() if 1 == len(segs)]
+    for edge in sorted(ends) + [e for (e, _) in segments]:
+        if all(used[s] for s in touching[edge]): continue
+        lines.append([crossing(e) for e in follow(edge)])
+
+    return lines
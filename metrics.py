@@ -0,0 +1,108 @@
+
+import json
+import time
+
+
+# off by default.  hot paths check this flag before doing anything else, so leaving it
+# off costs them one lookup per call
+enabled = False
+
+counters = {}
+peaks    = {}
+timers   = {}  # name -> [total seconds, times entered]
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def reset():
+    counters.clear()
+    peaks.clear()
+    timers.clear()
+
+
+def count(name, n=1):
+    counters[name] = counters.get(name, 0) + n
+
+
+def peak(name, value):
+    if value > peaks.get(name, 0):
+        peaks[name] = value
+
+
+
+class PhaseTimer(object):
+    """
+    adds the wall time spent inside a with block to the named timer
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        entry = timers.setdefault(self.name, [0.0, 0])
+        entry[0] += time.time() - self.start
+        entry[1] += 1
+        return False
+
+
+
+class NoTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NO_TIMER = NoTimer()
+
+
+def timer(name):
+    """
+    with timer("phase"): ... -- time a phase, if metrics are enabled.  phases can nest,
+    and each one counts all the time spent inside it
+    """
+    return PhaseTimer(name) if enabled else NO_TIMER
+
+
+def report():
+    """
+    everything collected since the last reset, as plain data
+    """
+    return {
+        "timers":   dict((name, {"seconds": s, "calls": n}) for (name, (s, n)) in timers.items()),
+        "counters": dict(counters),
+        "peaks":    dict(peaks),
+        }
+
+
+def summary():
+    """
+    everything collected since the last reset, as text for the console
+    """
+    lines = []
+    if timers:
+        lines.append("phase                        seconds     calls")
+        for name, (s, n) in sorted(timers.items(), key=lambda item: -item[1][0]):
+            lines.append("  %-24s %9.3f %9d" % (name, s, n))
+    if counters:
+        lines.append("counter")
+        for name in sorted(counters):
+            lines.append("  %-24s %19d" % (name, counters[name]))
+    if peaks:
+        lines.append("peak")
+        for name in sorted(peaks):
+            lines.append("  %-24s %19d" % (name, peaks[name]))
+    return "\n".join(lines) or "no metrics collected"
+
+
+def save(filename):
+    with open(filename, "w") as f:
+        json.dump(report(), f, indent=1, sort_keys=True)
@@ -0,0 +1,106 @@
+
+import time
+import numpy
+
+
+class PathAnimator(object):
+    """
+    play a ball path onto a table, a frame at a time from the Tk loop
+
+    every frame (fps per second, scheduled with after()) draws as many path steps as fit
+    in budget of the frame time and then flushes once.  each step stamps just the ball's
+    shell, in batches: the rings of successive steps add up to everything the ball swept.
+    with steps_per_second the animation keeps that pace, and a frame that comes in late
+    catches up in one go rather than replaying the frames it missed (counted in dropped).
+    without it, it plays as fast as the budget allows
+    """
+
+    CHUNK = 256  # steps stamped per draw_points call
+
+    def __init__(self, table, ball, path, widget=None, fps=30, steps_per_second=None, budget=0.8,
+                 on_done=None):
+        self.table    = table
+        self.ball     = ball
+        self.path     = numpy.array([(x, y, exploratory) for (x, y, exploratory) in path], dtype=int).reshape(-1, 3)
+        self.widget   = widget if widget is not None else table.get_drawing_area()
+        self.interval = 1.0 / fps
+        self.budget   = budget * self.interval
+        self.steps_per_second = steps_per_second
+        self.on_done  = on_done
+
+        self.index    = 0     # next step to draw
+        self.frames   = 0
+        self.dropped  = 0
+        self.running  = False
+        self.after_id = None
+        self.start_time = None
+        self.next_frame = None
+
+
+    def start(self):
+        self.running = True
+        self.start_time = self.next_frame = time.time()
+        self.after_id = self.widget.after(0, self.frame)
+
+
+    def stop(self):
+        """
+        halt where it is; nothing more is drawn
+        """
+        self.running = False
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+
+
+    def is_done(self):
+        return self.index >= len(self.path)
+
+
+    def frame(self):
+        self.after_id = None
+        if not self.running: return
+
+        now = time.time()
+        late = now - self.next_frame
+        if late > self.interval:
+            self.dropped += int(late / self.interval)
+        self.draw_frame(now)
+
+        if self.is_done():
+            self.running = False
+            if self.on_done is not None:
+                self.on_done()
+            return
+
+        self.next_frame = max(self.next_frame + self.interval, now)
+        delay = max(0, int(1000 * (self.next_frame - time.time())))
+        self.after_id = self.widget.after(delay, self.frame)
+
+
+    def draw_frame(self, now=None):
+        """
+        draw the steps due by now (all of them, without a pace), for as long as the budget lasts
+        """
+        now = now or time.time()
+        target = len(self.path)
+        if self.steps_per_second is not None:
+            target = min(target, int((now - self.start_time) * self.steps_per_second) + 1)
+
+        while self.index < target and time.time() - now < self.budget:
+            end = min(target, self.index + self.CHUNK)
+            self.draw_steps(self.path[self.index:end])
+            self.index = end
+
+        self.table.flush()
+        self.frames += 1
+
+
+    def draw_steps(self, steps):
+        # the shells first, then the centers on top: green exploring, black in transit
+        shell = self.ball.templates.shell
+        centers = steps[:, :2]
+        self.table.draw_points((centers[:, numpy.newaxis, :] + shell).reshape(-1, 2), "yellow")
+        exploratory = steps[:, 2].astype(bool)
+        self.table.draw_points(centers[exploratory], "green")
+        self.table.draw_points(centers[~exploratory], "black")
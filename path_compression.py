@@ -0,0 +1,199 @@
+
+import math
+from collections import namedtuple
+
+
+# kind is "move" (start somewhere new), "line" or "arc".  arcs go from the previous end
+# to this end around center, counter-clockwise if ccw.  exploratory is passed through
+# from solver paths, and is None otherwise
+MotionCommand = namedtuple("MotionCommand", "kind end center ccw exploratory")
+
+
+def perpendicular_distance(p, a, b):
+    """
+    distance from p to the line segment a-b
+    """
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    if 0 == dx and 0 == dy:
+        return math.hypot(p[0] - a[0], p[1] - a[1])
+    t = ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / float(dx * dx + dy * dy)
+    t = max(0.0, min(1.0, t))
+    return math.hypot(p[0] - (a[0] + t * dx), p[1] - (a[1] + t * dy))
+
+
+def merge_collinear(points):
+    """
+    indices of the points left after dropping the middles of straight runs (and repeats)
+    """
+    out = []
+    for i, p in enumerate(points):
+        if out and p == points[out[-1]]: continue
+        if 2 <= len(out):
+            a, b = points[out[-2]], points[out[-1]]
+            if 0 == (b[0] - a[0]) * (p[1] - b[1]) - (b[1] - a[1]) * (p[0] - b[0]):
+                if 0 <= (b[0] - a[0]) * (p[0] - b[0]) + (b[1] - a[1]) * (p[1] - b[1]):
+                    out[-1] = i
+                    continue
+        out.append(i)
+    return out
+
+
+def douglas_peucker(points, tolerance):
+    """
+    indices of the points that keep the polyline within tolerance of the original
+    """
+    if len(points) < 3: return range(len(points))
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        worst, index = 0.0, None
+        for i in range(first + 1, last):
+            d = perpendicular_distance(points[i], points[first], points[last])
+            if d > worst:
+                worst, index = d, i
+        if index is not None and worst > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [i for i, k in enumerate(keep) if k]
+
+
+def circle_through(a, b, c):
+    """
+    (center, radius) of the circle through three points, or None if they're in a line
+    """
+    d = 2.0 * (a[0] * (b[1] - c[1]) + b[0] * (c[1] - a[1]) + c[0] * (a[1] - b[1]))
+    if 0 == d: return None
+    aa = a[0] * a[0] + a[1] * a[1]
+    bb = b[0] * b[0] + b[1] * b[1]
+    cc = c[0] * c[0] + c[1] * c[1]
+    ux = (aa * (b[1] - c[1]) + bb * (c[1] - a[1]) + cc * (a[1] - b[1])) / d
+    uy = (aa * (c[0] - b[0]) + bb * (a[0] - c[0]) + cc * (b[0] - a[0])) / d
+    return ((ux, uy), math.hypot(a[0] - ux, a[1] - uy))
+
+
+class PathCompressor(object):
+    """
+    turn per-pixel polylines into straight line and arc motion commands
+
+    collinear runs are merged first, then Douglas-Peucker picks the vertices that keep
+    every original point within tolerance.  consecutive vertices are replaced by a single
+    arc wherever one circle fits all the original points between them within tolerance.
+    points more than max_step apart are not joined: a new "move" starts there instead
+    """
+
+    def __init__(self, tolerance=0.5, use_arcs=True, max_step=1.5, max_radius=1000.0):
+        self.tolerance  = tolerance
+        self.use_arcs   = use_arcs
+        self.max_step   = max_step
+        self.max_radius = max_radius
+        self.points_in  = 0
+        self.commands_out = 0
+
+
+    def ratio(self):
+        """
+        points in per command out, over everything compressed so far
+        """
+        if 0 == self.commands_out: return 0.0
+        return float(self.points_in) / self.commands_out
+
+
+    def compress(self, points, exploratory=None):
+        """
+        motion commands for a list of (x, y) points
+        """
+        commands = []
+        run = []
+        for p in points:
+            if run and math.hypot(p[0] - run[-1][0], p[1] - run[-1][1]) > self.max_step:
+                commands += self.compress_run(run, exploratory)
+                run = []
+            run.append((p[0], p[1]))
+        if run:
+            commands += self.compress_run(run, exploratory)
+
+        self.points_in += len(points)
+        self.commands_out += len(commands)
+        return commands
+
+
+    def compress_path(self, path):
+        """
+        motion commands for a solver path of (x, y, exploratory): runs with the same
+        exploratory flag are compressed separately, each picking up where the last ended
+        """
+        commands = []
+        start = 0
+        for i in range(1, len(path) + 1):
+            if i < len(path) and path[i][2] == path[start][2]: continue
+
+            if 0 == start:
+                commands += self.compress([(x, y) for (x, y, e) in path[:i]], path[start][2])
+            else:
+                # start from the previous run's last point, so no move is needed in between
+                run = self.compress([(x, y) for (x, y, e) in path[start - 1:i]], path[start][2])
+                commands += run[1:]
+                self.points_in -= 1
+                self.commands_out -= 1
+            start = i
+
+        return commands
+
+
+    def compress_run(self, run, exploratory):
+        # a line is never farther from the points it replaces than at its ends, so
+        # Douglas-Peucker only needs the corners.  arcs are checked against every point
+        corners = merge_collinear(run)
+        keep = [corners[i] for i in douglas_peucker([run[i] for i in corners], self.tolerance)]
+        points = run
+        commands = [MotionCommand("move", points[0], None, None, exploratory)]
+
+        i = 0
+        while i < len(keep) - 1:
+            j = i + 1
+            arc = None
+            if self.use_arcs:
+                # grow the arc as far as it still fits
+                for k in range(i + 2, len(keep)):
+                    fit = self.fit_arc(points, keep[i], keep[k])
+                    if fit is None: break
+                    j, arc = k, fit
+
+            if arc is None:
+                commands.append(MotionCommand("line", points[keep[j]], None, None, exploratory))
+            else:
+                center, ccw = arc
+                commands.append(MotionCommand("arc", points[keep[j]], center, ccw, exploratory))
+            i = j
+
+        return commands
+
+
+    def fit_arc(self, points, first, last):
+        """
+        (center, ccw) of a circle through points[first], the middle point and points[last]
+        that all points in between stay within tolerance of, sweeping one way; else None
+        """
+        mid = (first + last) // 2
+        circle = circle_through(points[first], points[mid], points[last])
+        if circle is None: return None
+        (cx, cy), r = circle
+        if r > self.max_radius: return None
+
+        turn = 0
+        for i in range(first, last + 1):
+            px, py = points[i]
+            if abs(math.hypot(px - cx, py - cy) - r) > self.tolerance: return None
+            if i < last:
+                qx, qy = points[i + 1]
+                cross = (px - cx) * (qy - cy) - (py - cy) * (qx - cx)
+                if 0 == turn:
+                    turn = cross
+                elif 0 > turn * cross:
+                    return None
+
+        return ((cx, cy), bool(0 < turn))
@@ -0,0 +1,178 @@
+
+def path_length(points):
+    """
+    total manhattan length of a list of (x, y, ...) points
+    """
+    return sum(abs(b[0] - a[0]) + abs(b[1] - a[1]) for a, b in zip(points, points[1:]))
+
+
+def split_segments(path):
+    """
+    the exploratory runs of a (x, y, exploratory) path, as lists of (x, y)
+
+    a run ends at any non-exploratory step, or wherever consecutive steps aren't adjacent
+    """
+    segments = []
+    current = []
+    for (x, y, exploratory) in path:
+        if not exploratory:
+            if current: segments.append(current)
+            current = []
+            continue
+        if current and 1 < abs(x - current[-1][0]) + abs(y - current[-1][1]):
+            segments.append(current)
+            current = []
+        current.append((x, y))
+    if current: segments.append(current)
+    return segments
+
+
+class PathOptimizer(object):
+    """
+    reorder the exploratory segments of a coverage path to cut down the transit between them
+
+    segments keep their own steps but may be driven in either direction.  the order starts
+    with a nearest neighbor tour, then is improved with 2-opt (reverse a run of segments)
+    and Or-opt (move a chain of up to 3 segments elsewhere), using manhattan distance as the
+    cost of a transit.  the transits are then planned for real with planner over passable
+    (see a_star.GridAStar).  the first segment stays first, since that's where the ball is
+    """
+
+    def __init__(self, planner, passable, window=50, max_passes=10):
+        self.planner    = planner
+        self.passable   = passable
+        self.window     = window
+        self.max_passes = max_passes
+        self.before     = 0
+        self.after      = 0
+
+
+    def optimize(self, path):
+        """
+        return a new (x, y, exploratory) path covering the same exploratory steps
+        """
+        self.before = path_length(path)
+        self.segments = split_segments(path)
+        if not self.segments: return path[:]
+
+        order = self.nearest_neighbor()
+        for i in range(self.max_passes):
+            improved = self.two_opt(order)
+            improved = self.or_opt(order) or improved
+            if not improved: break
+
+        new_path = self.stitch(order)
+        self.after = path_length(new_path)
+
+        print "Path optimizer: distance", self.before, "->", self.after,
+        print "over", len(self.segments), "segments"
+        return new_path
+
+
+    # a tour entry is (segment index, reversed)
+    def first(self, entry):
+        i, rev = entry
+        return self.segments[i][-1 if rev else 0]
+
+    def last(self, entry):
+        i, rev = entry
+        return self.segments[i][0 if rev else -1]
+
+    @staticmethod
+    def dist(a, b):
+        return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+    def nearest_neighbor(self):
+        order = [(0, False)]
+        todo = set(range(1, len(self.segments)))
+        while todo:
+            here = self.last(order[-1])
+            d, entry = min(min((self.dist(here, self.segments[i][0]),  (i, False)),
+                               (self.dist(here, self.segments[i][-1]), (i, True)))
+                           for i in todo)
+            order.append(entry)
+            todo.remove(entry[0])
+        return order
+
+
+    def two_opt(self, order):
+        """
+        reverse order[i..j] (flipping each segment) wherever that shortens the transits
+        """
+        improved = False
+        n = len(order)
+        for i in range(1, n):
+            for j in range(i, min(n, i + self.window)):
+                before = self.last(order[i - 1])
+                after = self.first(order[j + 1]) if j + 1 < n else None
+
+                old = self.dist(before, self.first(order[i]))
+                new = self.dist(before, self.last(order[j]))
+                if after is not None:
+                    old += self.dist(self.last(order[j]), after)
+                    new += self.dist(self.first(order[i]), after)
+
+                if new < old:
+                    order[i:j + 1] = [(k, not rev) for (k, rev) in reversed(order[i:j + 1])]
+                    improved = True
+        return improved
+
+
+    def or_opt(self, order):
+        """
+        move a chain of 1 to 3 segments to a better spot, either way around
+        """
+        improved = False
+        for k in (1, 2, 3):
+            i = 1
+            while i + k <= len(order):
+                chain = order[i:i + k]
+                before = self.last(order[i - 1])
+                after = self.first(order[i + k]) if i + k < len(order) else None
+
+                # what we save by taking the chain out
+                removed = self.dist(before, self.first(chain[0]))
+                if after is not None:
+                    removed += self.dist(self.last(chain[-1]), after) - self.dist(before, after)
+
+                rest = order[:i] + order[i + k:]
+                flipped = [(s, not rev) for (s, rev) in reversed(chain)]
+                best = (0, None, None)
+                for p in range(max(0, i - self.window), min(len(rest), i + self.window)):
+                    a = self.last(rest[p])
+                    b = self.first(rest[p + 1]) if p + 1 < len(rest) else None
+                    for c in (chain, flipped):
+                        added = self.dist(a, self.first(c[0]))
+                        if b is not None:
+                            added += self.dist(self.last(c[-1]), b) - self.dist(a, b)
+                        gain = removed - added
+                        if gain > best[0]:
+                            best = (gain, p, c)
+
+                gain, p, c = best
+                if p is not None:
+                    order[:] = rest[:p + 1] + c + rest[p + 1:]
+                    improved = True
+                i += 1
+        return improved
+
+
+    def stitch(self, order):
+        """
+        join the ordered segments with planned transits
+        """
+        path = []
+        for entry in order:
+            i, rev = entry
+            points = self.segments[i][::-1] if rev else self.segments[i]
+            if path:
+                here = path[-1][:2]
+                there = points[0]
+                if 1 < self.dist(here, there):
+                    transit = self.planner.solve(here, there, self.passable)
+                    if transit is None:
+                        raise AssertionError("Couldn't go from " + str(here) + " to " + str(there))
+                    path += [(x, y, False) for (x, y) in transit[1:-1]]
+            path += [(x, y, True) for (x, y) in points]
+        return path
@@ -0,0 +1,72 @@
+
+class Pipeline(object):
+    """
+    named stages that are only computed when asked for, and only again when an input changed
+
+    an input is either a parameter (see set and touch) or another stage.  every parameter
+    and stage result has a version, and each stage remembers the versions of the inputs
+    its last result came from.  stage functions are called as fn(changed, *inputs), where
+    changed is the set of input names that are different from last time (all of them the
+    first time), so a stage can bring its last result up to date instead of starting over
+    """
+
+    def __init__(self):
+        self.params   = {}
+        self.stages   = {}  # name -> (fn, input names)
+        self.versions = {}  # name -> version of a parameter or of a stage's result
+        self.results  = {}  # name -> (input versions, result)
+        self.runs     = {}  # name -> how many times the stage has been computed
+
+
+    def add_stage(self, name, fn, inputs=()):
+        self.stages[name] = (fn, tuple(inputs))
+        self.runs[name] = 0
+
+
+    def set(self, **params):
+        """
+        set parameters; only ones whose value changes make their stages stale
+        """
+        for name, value in params.items():
+            if name in self.params and self.params[name] == value: continue
+            self.params[name] = value
+            self.touch(name)
+
+
+    def touch(self, name):
+        """
+        mark a parameter or stage as changed, e.g. for data that was changed in place
+        """
+        self.versions[name] = self.versions.get(name, 0) + 1
+
+
+    def clear(self):
+        """
+        forget every stage's result, e.g. after one was interrupted halfway
+        """
+        self.results = {}
+
+
+    def get(self, name):
+        """
+        the value of a parameter, or the result of a stage, computing whatever is stale
+        """
+        if name in self.params:
+            return self.params[name]
+
+        fn, inputs = self.stages[name]
+        values = [self.get(i) for i in inputs]
+        key = tuple(self.versions.get(i, 0) for i in inputs)
+
+        if name in self.results:
+            last_key, result = self.results[name]
+            if last_key == key: return result
+            changed = set(i for (i, a, b) in zip(inputs, last_key, key) if a != b)
+        else:
+            changed = set(inputs)
+
+        result = fn(changed, *values)
+        self.results[name] = (key, result)
+        self.runs[name] += 1
+        self.touch(name)
+        return result
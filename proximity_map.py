@@ -1,21 +1,115 @@
 
-import ball
+import numpy
+import metrics
+from distance_transform import distance_transform
+
 
 class ProximityMap(object):
+    """
+    how far each point is from the nearest point the ball may not go, as a table-sized field
+
+    points in visited_list are allowed; everything else (including off the table) is not.
+    distances beyond the reach of the ball given to solve() come back as None.  lookups are
+    a single array read, and update() only recomputes around the points that changed
+    """
 
-    def __init__(self, width, height, covered_list, visited_list):
+    def __init__(self, width, height, visited_list):
         self.width        = width
         self.height       = height
-        self.covered_list = covered_list
         self.visited_list = visited_list
 
+        self.reach     = None
+        self.weight_fn = None
+        self.field     = None  # (width, height) distances, nan past reach
+        self.weights   = None  # weight_fn of field, if there is a weight_fn
+        self.check     = None  # called now and then while computing; can raise to stop
+
+        # padded by one so that off the table is never allowed
+        self.allowed = numpy.zeros((width + 2, height + 2), dtype=bool)
+        pts = numpy.asarray(visited_list, dtype=int).reshape(-1, 2)
+        self.allowed[pts[:, 0] + 1, pts[:, 1] + 1] = True
+
+
+    def solve(self, radius, weight_fn=None):
+        """
+        compute the field for a ball of radius, so distances up to radius - 1 are kept
+
+        weight_fn, if given, maps an array of distances to an array of weights (nan in, nan out)
+        """
+        self.reach = radius - 1
+        self.weight_fn = weight_fn
+        self.field = numpy.empty((self.width, self.height))
+        self.weights = None if weight_fn is None else numpy.empty((self.width, self.height))
+        self.recompute(0, 0, self.width, self.height)
+        return self.field
+
+
+    def recompute(self, x0, y0, x1, y1):
+        """
+        refresh the field for x0 <= x < x1, y0 <= y < y1
+
+        only non-allowed points within reach can matter, so the distance transform runs
+        over the region grown by reach, not the whole table
+        """
+        r = int(self.reach) + 1
+        wx0, wy0 = max(0, x0 - r), max(0, y0 - r)
+        wx1, wy1 = min(self.width, x1 + r), min(self.height, y1 + r)
+
+        # window in padded coordinates, plus the padding ring where the window touches the edges
+        window = ~self.allowed[wx0:wx1 + 2, wy0:wy1 + 2]
+        dist = distance_transform(window, self.check)[x0 - wx0 + 1:x1 - wx0 + 1, y0 - wy0 + 1:y1 - wy0 + 1]
+        dist[dist > self.reach] = numpy.nan
+
+        if metrics.enabled: metrics.count("proximity_cells_computed", dist.size)
+        self.field[x0:x1, y0:y1] = dist
+        if self.weight_fn is not None:
+            self.weights[x0:x1, y0:y1] = self.weight_fn(dist)
+
+
+    def update(self, allowed_points=(), blocked_points=()):
+        """
+        points that became allowed and that stopped being allowed, e.g. after rocks moved
+
+        returns the (x0, y0, x1, y1) region that was recomputed (x1, y1 exclusive), or None
+        """
+        changed = []
+        for points, is_allowed in ((allowed_points, True), (blocked_points, False)):
+            pts = numpy.asarray(points, dtype=int).reshape(-1, 2)
+            self.allowed[pts[:, 0] + 1, pts[:, 1] + 1] = is_allowed
+            changed.append(pts)
+        changed = numpy.concatenate(changed)
+        if 0 == len(changed): return None
+
+        # only points within reach of a change can see a different nearest point
+        r = int(self.reach)
+        x0 = max(0, changed[:, 0].min() - r)
+        y0 = max(0, changed[:, 1].min() - r)
+        x1 = min(self.width,  changed[:, 0].max() + r + 1)
+        y1 = min(self.height, changed[:, 1].max() + r + 1)
+        if self.field is not None:
+            self.recompute(x0, y0, x1, y1)
+        return (x0, y0, x1, y1)
+
 
+    def proximity(self, x, y):
+        """
+        distance from (x, y) to the nearest non-allowed point, or None if out of reach
+        """
+        if metrics.enabled: metrics.count("proximity_queries")
+        if not (0 <= x < self.width and 0 <= y < self.height): return None
+        d = self.field[x, y]
+        return None if d != d else float(d)
 
-    def solve(radius, weight_fn):
-        prox = [[None for y in range(self.height)] for x in range(self.width)]
+    def __getitem__(self, point):
+        return self.proximity(*point)
 
-        # for each point in radius of influence, if point is covered then add prox to total prox
-        # find a path within min/max proximity in either direction
-        
 
-        return prox
+    def weight(self, x, y):
+        """
+        weight_fn of the proximity at (x, y), or None if out of reach
+        """
+        if self.weight_fn is None:
+            return self.proximity(x, y)
+        if metrics.enabled: metrics.count("proximity_queries")
+        w = self.weights[x, y]
+        return None if w != w else float(w)
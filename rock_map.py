@@ -0,0 +1,141 @@
+
+import struct
+import numpy
+
+
+# header: magic, format version, payload mode, two pad bytes, width, height (16 bytes)
+HEADER  = struct.Struct("<4sBBxxII")
+MAGIC   = "ZRCK"
+VERSION = 1
+
+# payload modes
+BITS = 0  # the packed columns, as stored in memory
+RLE  = 1  # uint32 run lengths over all points column by column, sand first
+
+
+def run_lengths(flat):
+    """
+    lengths of the alternating runs of False and True in a 1D boolean array, False first
+    """
+    if 0 == len(flat): return numpy.zeros(0, dtype=numpy.uint32)
+    change = numpy.flatnonzero(flat[1:] != flat[:-1]) + 1
+    runs = numpy.diff(numpy.concatenate(([0], change, [len(flat)])))
+    if flat[0]:
+        runs = numpy.concatenate(([0], runs))
+    return runs.astype(numpy.uint32)
+
+
+
+class RockMap(object):
+    """
+    a rock bitmap packed 8 points to a byte: one column (fixed x) after another, each
+    padded to whole bytes, so a point is one byte read and a column range is one slice
+
+    it can stand in for a rockpoint list of lists: len() is the width, map[x] is column x
+    and map[x0:x1] is those columns, both unpacked into boolean arrays
+    """
+
+    def __init__(self, width, height, bits=None):
+        self.width  = width
+        self.height = height
+        self.stride = (height + 7) // 8
+        if bits is None:
+            bits = numpy.zeros((width, self.stride), dtype=numpy.uint8)
+        self.bits = bits
+
+
+    @staticmethod
+    def from_rockpoint(rockpoint):
+        rocks = numpy.asarray(rockpoint, dtype=bool)
+        w, h = rocks.shape
+        return RockMap(w, h, numpy.packbits(rocks, axis=1))
+
+
+    def copy(self):
+        return RockMap(self.width, self.height, numpy.array(self.bits))
+
+
+    def is_rock(self, x, y):
+        # off the table counts as rock
+        if not (0 <= x < self.width and 0 <= y < self.height): return True
+        return bool(self.bits[x, y >> 3] & (0x80 >> (y & 7)))
+
+
+    def set(self, x, y, is_rock=True):
+        if is_rock:
+            self.bits[x, y >> 3] |= 0x80 >> (y & 7)
+        else:
+            self.bits[x, y >> 3] &= 0xff ^ (0x80 >> (y & 7))
+
+
+    def region(self, x0, y0, x1, y1):
+        """
+        the rocks in x0 <= x < x1, y0 <= y < y1 as a boolean array, unpacking only those bytes
+        """
+        b0 = y0 >> 3
+        unpacked = numpy.unpackbits(self.bits[x0:x1, b0:(y1 + 7) >> 3], axis=1)
+        return unpacked[:, y0 - 8 * b0:y1 - 8 * b0].astype(bool).reshape(max(0, x1 - x0), max(0, y1 - y0))
+
+
+    def to_array(self):
+        return self.region(0, 0, self.width, self.height)
+
+    def __array__(self, dtype=None):
+        a = self.to_array()
+        return a if dtype is None else a.astype(dtype)
+
+    def __len__(self):
+        return self.width
+
+    def __getitem__(self, x):
+        if isinstance(x, slice):
+            x0, x1, step = x.indices(self.width)
+            return self.region(x0, 0, x1, self.height)[::step]
+        if x < 0: x += self.width
+        if not (0 <= x < self.width): raise IndexError("column out of range")
+        return self.region(x, 0, x + 1, self.height)[0]
+
+    def __iter__(self):
+        for x in range(self.width):
+            yield self[x]
+
+
+    def save(self, filename, rle=False):
+        with open(filename, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RLE if rle else BITS, self.width, self.height))
+            if rle:
+                f.write(run_lengths(self.to_array().ravel()).astype("<u4").tostring())
+            else:
+                f.write(numpy.ascontiguousarray(self.bits).tostring())
+
+
+    @staticmethod
+    def is_rock_map_file(filename):
+        with open(filename, "rb") as f:
+            return MAGIC == f.read(len(MAGIC))
+
+
+    @staticmethod
+    def load(filename):
+        """
+        read a rock map file.  packed bits are memory mapped rather than read: only the
+        pages that get looked at are loaded, and changes stay in memory (copy on write)
+        """
+        with open(filename, "rb") as f:
+            magic, version, mode, w, h = HEADER.unpack(f.read(HEADER.size))
+        if MAGIC != magic:
+            raise ValueError("%s is not a rock map" % filename)
+        if VERSION != version:
+            raise ValueError("%s has rock map version %d, expected %d" % (filename, version, VERSION))
+
+        if BITS == mode:
+            bits = numpy.memmap(filename, dtype=numpy.uint8, mode="c", offset=HEADER.size,
+                                shape=(w, (h + 7) // 8))
+            return RockMap(w, h, bits)
+
+        if RLE == mode:
+            runs = numpy.memmap(filename, dtype="<u4", mode="r", offset=HEADER.size)
+            values = 1 == numpy.arange(len(runs)) % 2
+            return RockMap.from_rockpoint(numpy.repeat(values, runs).reshape(w, h))
+
+        raise ValueError("%s has unknown rock map mode %d" % (filename, mode))
@@ -23,30 +23,19 @@ class SandRipple(object):
     # @aArray: float[][] - the 2D array to be normalized
     # @z: float          - the normalization factor
     def normalize(self, z):
-        v_min = None
-        v_max = None
-
-        aArray = [x[:] for x in self.data]
-        for col in aArray:
-            for v in col:
-                if v_min is None or v < v_min:
-                    v_min = v
-                if v_max is None or v_max < v:
-                    v_max = v
+        H = numpy.asarray(self.data, dtype=float)
+        v_min = H.min()
+        v_max = H.max()
 
         f = z / (v_max - v_min)
-
-        for i, col in enumerate(aArray):
-            for j, v in enumerate(col):
-                aArray[i][j] = (v - v_min) * f
-        return aArray
+        return (H - v_min) * f
 
 
 
     # return 2d height map with v
     def generateInitial(self, w, h, aHeightVariation, aHeightOffset, aSeed):
         random.seed(aSeed)
-        return [[random.gauss(aHeightOffset, aHeightVariation) for _ in range(h)] for __ in range(w)]
+        return numpy.array([[random.gauss(aHeightOffset, aHeightVariation) for _ in range(h)] for __ in range(w)])
 
 
     """
@@ -61,9 +50,65 @@ class SandRipple(object):
     * @param numsteps number of iterations of algorithm
     * @return 2d float array containing sand ripples as heightmap hopefully
     """
+    def iterate(self, hopX, windX, hopY, windY, grain, gravity, critAng, numsteps):
+        """
+        numpy version of iterate_python: every cell is updated at once
+
+        each step reads only from the previous height map, so saltation and creep can be
+        computed for the whole grid with toroidal shifts and the blown grains scattered
+        back in with a single add.at
+        """
+
+        # python 2 round() goes half away from zero, numpy.round goes half to even
+        def round_away(a):
+            return numpy.sign(a) * numpy.floor(numpy.abs(a) + 0.5)
+
+        Hodd = numpy.array(self.data, dtype=float)
+        cols, rows = Hodd.shape
+        x = numpy.arange(cols).reshape(cols, 1)
+        y = numpy.arange(rows).reshape(1, rows)
+
+        for currstep in range(numsteps):
+            h   = Hodd
+            hU  = numpy.roll(h,   1, axis=0)
+            hD  = numpy.roll(h,  -1, axis=0)
+            hL  = numpy.roll(h,   1, axis=1)
+            hR  = numpy.roll(h,  -1, axis=1)
+            hLU = numpy.roll(hU,  1, axis=1)
+            hRU = numpy.roll(hU, -1, axis=1)
+            hLD = numpy.roll(hD,  1, axis=1)
+            hRD = numpy.roll(hD, -1, axis=1)
+
+            # SALTATION
+            delHx = hD - h
+            delHy = hR - h
+            delH  = numpy.sign(delHx) * numpy.hypot(delHx, delHy)
+
+            hopLengthX = (hopX + windX * h) * (1 - numpy.tanh(delHx))
+            hopLengthY = (hopY + windY * h) * (1 - numpy.tanh(delHy))
+
+            grainAmt = -1.0 * grain * (1 + numpy.tanh(delH))
+
+            blowToX = round_away(x + hopLengthX).astype(int) % cols
+            blowToY = round_away(y + hopLengthY).astype(int) % rows
+
+            Heven = h - grainAmt
+            numpy.add.at(Heven, (blowToX, blowToY), grainAmt)
+
+            # CREEP due to gravity
+            firstNbrSum = 0.16666 * (hU + hD + hL + hR)
+            secondNbrSum = 0.083333 * (hLU + hRU + hLD + hRD)
+            Heven += gravity * (firstNbrSum + secondNbrSum - h)
+
+            Hodd = Heven
+
+        self.data = Hodd
+
+
+    # the original per-cell implementation, kept as the reference for iterate()
     # TODO : split different operations into their own functions
     #      : make gravity zero-sum
-    def iterate(self, hopX, windX, hopY, windY, grain, gravity, critAng, numsteps):
+    def iterate_python(self, hopX, windX, hopY, windY, grain, gravity, critAng, numsteps):
 
         # surprisingly, python doesn't build this in
         def sign(x):
@@ -71,7 +116,7 @@ class SandRipple(object):
             if 0 < x: return 1
             return 0
 
-        H    = self.data
+        H    = numpy.asarray(self.data).tolist()
         cols = len(H)
         rows = len(H[0])
 
@@ -169,4 +214,4 @@ class SandRipple(object):
 
             Hodd = [col[:] for col in Heven]
 
-            self.data = Hodd
+            self.data = numpy.array(Hodd)
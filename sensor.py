@@ -1,6 +1,8 @@
 
 import math
+import numpy
 import ball
+import metrics
 
 pythag = lambda x1, y1, x2, y2: math.hypot(x1 - x2, y1 - y2)
 
@@ -25,7 +27,78 @@ class RockSensor(object):
 
 
 class DisplacementSensor(RockSensor):
-    
+
+    def __init__(self, ball, do_debug):
+        super(DisplacementSensor, self).__init__(ball, do_debug)
+        self.obstacle_map = None
+
+
+    def build_obstacle_map(self, rockpoint):
+        """
+        precompute the configuration space: which ball centers would touch a rock
+
+        this dilates the rock bitmap by the ball's coverage template, one cumulative sum per
+        template column, so that is_blocked is a single lookup.  points off the table count
+        as rock (as is_rockpoint does for y past the end of a column)
+        """
+        w, h = len(rockpoint), len(rockpoint[0])
+        with metrics.timer("obstacle_map"):
+            self.obstacle_map = self.obstacles(rockpoint, 0, 0, w, h)
+
+
+    def update_obstacle_map(self, rockpoint, x0, y0, x1, y1):
+        """
+        refresh the obstacle map after rocks changed in x0 <= x < x1, y0 <= y < y1
+
+        returns the region of centers that was recomputed (the change grown by the ball)
+        and what the obstacle map held there before
+        """
+        rr = self.ball.radius - 1
+        w, h = self.obstacle_map.shape
+        x0, y0 = max(0, x0 - rr), max(0, y0 - rr)
+        x1, y1 = min(w, x1 + rr), min(h, y1 + rr)
+
+        before = self.obstacle_map[x0:x1, y0:y1].copy()
+        with metrics.timer("obstacle_map"):
+            self.obstacle_map[x0:x1, y0:y1] = self.obstacles(rockpoint, x0, y0, x1, y1)
+        return (x0, y0, x1, y1), before
+
+
+    def obstacles(self, rockpoint, x0, y0, x1, y1):
+        """
+        which centers in x0 <= x < x1, y0 <= y < y1 would touch a rock, as a boolean array
+        """
+        rr = self.ball.radius - 1
+        w, h = len(rockpoint), len(rockpoint[0])
+        bw, bh = x1 - x0, y1 - y0
+
+        # the rocks in reach of the region, off the table as rock, with a 0 column for the sums
+        padded = numpy.ones((bw + 2 * rr, bh + 2 * rr + 1), dtype=numpy.int32)
+        padded[:, 0] = 0
+        sx0, sy0 = max(0, x0 - rr), max(0, y0 - rr)
+        sx1, sy1 = min(w, x1 + rr), min(h, y1 + rr)
+        ox, oy = sx0 - (x0 - rr), sy0 - (y0 - rr) + 1
+        padded[ox:ox + sx1 - sx0, oy:oy + sy1 - sy0] = [col[sy0:sy1] for col in rockpoint[sx0:sx1]]
+        sums = numpy.cumsum(padded, axis=1)
+
+        # the template is a disc, so each of its columns is a contiguous run of dy
+        blocked = numpy.zeros((bw, bh), dtype=bool)
+        for dx in range(-rr, rr + 1):
+            dys = numpy.nonzero(self.ball.mask[dx + rr])[0] - rr
+            lo, hi = dys[0], dys[-1]
+            col = sums[rr + dx:rr + dx + bw]
+            blocked |= 0 < (col[:, rr + hi + 1:rr + hi + 1 + bh] - col[:, rr + lo:rr + lo + bh])
+
+        return blocked
+
+
+    def is_blocked(self, ctr_x, ctr_y):
+        """
+        whether a ball centered here would touch a rock, from the precomputed obstacle map
+        """
+        if metrics.enabled: metrics.count("blocked_checks")
+        return self.obstacle_map[ctr_x, ctr_y]
+
 
     def displacement(self, ctr_x, ctr_y):
         """
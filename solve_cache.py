@@ -0,0 +1,118 @@
+
+import hashlib
+import os
+import zipfile
+import zlib
+import numpy
+
+
+class SolveCache(object):
+    """
+    solve results on disk, addressed by a hash of everything they were computed from
+
+    each entry is one .npz file: the path as an (n, 3) int array, visited, covered and
+    foreground as packed bits, and the contours as one array of points with their lengths.
+    loading an entry marks it as recently used; when the directory grows past max_bytes,
+    the least recently used entries are deleted
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+
+    @staticmethod
+    def key(rockpoint, radius, mode, num_contours):
+        """
+        hex digest of a rock bitmap and the settings the solve depends on
+
+        mode is anything else that changes the result, e.g. a tuple of solver options
+        """
+        rocks = numpy.asarray(rockpoint, dtype=bool)
+        h = hashlib.sha1()
+        h.update(repr((rocks.shape, radius, mode, num_contours)))
+        h.update(numpy.packbits(rocks).tostring())
+        return h.hexdigest()
+
+
+    def filename(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+
+    def load(self, key):
+        """
+        a dict of path, visited, covered, foreground and contours, or None if not cached.
+        an entry that can't be read (truncated or corrupt) counts as not cached and is deleted
+        """
+        filename = self.filename(key)
+        try:
+            with open(filename, "rb") as f:
+                data = numpy.load(f)
+                shape = tuple(data["shape"])
+                unpack = lambda name: numpy.unpackbits(data[name])[:shape[0] * shape[1]].reshape(shape).astype(bool)
+
+                points = data["contour_points"].tolist()
+                contours = []
+                start = 0
+                for n in data["contour_lengths"].tolist():
+                    contours.append([tuple(p) for p in points[start:start + n]])
+                    start += n
+
+                entry = {
+                    "path":       [(x, y, bool(e)) for (x, y, e) in data["path"].tolist()],
+                    "visited":    unpack("visited"),
+                    "covered":    unpack("covered"),
+                    "foreground": unpack("foreground"),
+                    "contours":   contours,
+                    }
+        except (IOError, EOFError, zipfile.BadZipfile, zlib.error, KeyError, ValueError):
+            self.misses += 1
+            if os.path.exists(filename):
+                os.remove(filename)
+            return None
+
+        os.utime(filename, None)
+        self.hits += 1
+        return entry
+
+
+    def store(self, key, path, visited, covered, foreground, contours):
+        points = [p for c in contours for p in c]
+        arrays = {
+            "shape":           numpy.array(visited.shape),
+            "path":            numpy.array(path, dtype=numpy.int32).reshape(-1, 3),
+            "visited":         numpy.packbits(visited),
+            "covered":         numpy.packbits(covered),
+            "foreground":      numpy.packbits(foreground),
+            "contour_points":  numpy.array(points).reshape(-1, 2),
+            "contour_lengths": numpy.array([len(c) for c in contours], dtype=numpy.int32),
+            }
+
+        # write then rename, so a reader never sees half an entry
+        filename = self.filename(key)
+        partial = filename + ".part"
+        with open(partial, "wb") as f:
+            numpy.savez_compressed(f, **arrays)
+        os.rename(partial, filename)
+        self.evict()
+
+
+    def evict(self):
+        """
+        delete the least recently used entries until the cache fits in max_bytes
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npz"): continue
+            st = os.stat(os.path.join(self.directory, name))
+            entries.append((st.st_mtime, st.st_size, name))
+
+        total = sum(size for (mtime, size, name) in entries)
+        for (mtime, size, name) in sorted(entries):
+            if total <= self.max_bytes: break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
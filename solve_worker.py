@@ -0,0 +1,165 @@
+
+import threading
+import traceback
+import Queue
+import numpy
+
+
+class SolveCancelled(Exception):
+    pass
+
+
+class Progress(object):
+    """
+    what a job running in a SolveWorker reports through: phases and counts go to the
+    main loop, and every report is also a point where the job can be cancelled
+    """
+
+    def __init__(self, worker, generation):
+        self.worker = worker
+        self.generation = generation
+
+    def report(self, phase, **counts):
+        self.check()
+        self.worker.post(self.generation, "progress", (phase, counts))
+
+    def check(self):
+        if self.worker.cancelled.is_set():
+            raise SolveCancelled()
+
+
+class StreamRenderer(object):
+    """
+    a renderer (see table_model.TableModel) for a worker's table that sends the drawing
+    to the main loop, which does it on the real table as it arrives
+    """
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.canvas = None
+
+    def draw_point(self, x, y, color):
+        self.worker.post(None, "draw_points", ([(x, y)], color))
+
+    def draw_points(self, points, color):
+        self.worker.post(None, "draw_points", (numpy.array(points), color))
+
+    def blit(self, array):
+        self.worker.post(None, "blit", numpy.array(array))
+
+    def flush(self):
+        self.worker.post(None, "flush", None)
+
+
+
+class SolveWorker(object):
+    """
+    run jobs in a thread while the Tk loop stays responsive
+
+    the thread only touches its own (headless) data and posts messages to a queue, which
+    the main loop drains every poll_ms with after(): drawing is done on table, progress goes
+    to on_progress(phase, counts), and on_done(result, error) gets called at the end.
+    cancel() is cooperative: the job stops at its next progress report, and whatever it
+    posted but the main loop hasn't handled yet is dropped.  there is only ever one poll
+    chain, which runs until the last job is done and everything it posted is handled
+    """
+
+    def __init__(self, widget, table, on_progress=None, on_done=None, poll_ms=50):
+        self.widget      = widget
+        self.table       = table
+        self.on_progress = on_progress
+        self.on_done     = on_done
+        self.poll_ms     = poll_ms
+        self.messages    = Queue.Queue()
+        self.cancelled   = threading.Event()
+        self.thread      = None
+        self.generation  = 0  # messages from other generations than this are dropped
+        self.job_generation = 0
+        self.polling     = False
+        self.renderer    = StreamRenderer(self)
+
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+
+    def start(self, job):
+        """
+        run job(progress) in the background; returns False if a job is already running
+        """
+        if self.is_running(): return False
+
+        self.generation += 1
+        self.job_generation = self.generation
+        self.cancelled.clear()
+        progress = Progress(self, self.generation)
+
+        def run():
+            result = error = None
+            try:
+                result = job(progress)
+            except Exception as e:
+                if not isinstance(e, SolveCancelled):
+                    traceback.print_exc()
+                error = e
+            self.post(progress.generation, "done", (result, error))
+
+        self.thread = threading.Thread(target=run, name="solve worker")
+        self.thread.daemon = True
+        self.thread.start()
+        if not self.polling:
+            self.polling = True
+            self.widget.after(self.poll_ms, self.poll)
+        return True
+
+
+    def cancel(self):
+        if not self.is_running(): return
+        self.cancelled.set()
+        self.generation += 1
+
+
+    def post(self, generation, kind, payload):
+        # called from the worker thread: drawing is tagged with the job that's running
+        if generation is None:
+            generation = self.job_generation
+        self.messages.put((generation, kind, payload))
+
+
+    def poll(self):
+        """
+        handle everything posted since the last poll, then look again later if a job is
+        still running or has posted more
+        """
+        drew = False
+        while True:
+            try:
+                generation, kind, payload = self.messages.get_nowait()
+            except Queue.Empty:
+                break
+
+            if "done" == kind:
+                # the latest job is done, even if it was cancelled; older ones don't matter
+                if generation == self.job_generation and self.on_done is not None:
+                    self.on_done(*payload)
+                continue
+            if generation != self.generation: continue
+
+            if "draw_points" == kind:
+                self.table.draw_points(*payload)
+                drew = True
+            elif "blit" == kind:
+                self.table.blit(payload)
+                drew = True
+            elif "flush" == kind:
+                self.table.flush()
+                drew = False
+            elif "progress" == kind and self.on_progress is not None:
+                self.on_progress(*payload)
+
+        if drew:
+            self.table.flush()
+        if self.is_running() or not self.messages.empty():
+            self.widget.after(self.poll_ms, self.poll)
+        else:
+            self.polling = False
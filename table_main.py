@@ -1,70 +1,297 @@
 from Tkinter import Tk, Canvas, RIGHT, BOTH, RAISED
 from ttk import Frame, Button, Style
+import argparse
+import json
+import sys
 
 from zen_table import ZenTable
+from table_model import TableModel
 from button_bar import ButtonBar
 from boustrophedon_solver import BoustrophedonSolver
 from contour_solver import ContourSolver
 from ball import Ball
 from background import LinearBackground
+from pipeline import Pipeline
+from path_compression import PathCompressor
+from solve_cache import SolveCache
+from solve_worker import SolveWorker, SolveCancelled
+import metrics
 
 from sand_ripple import SandRipple
 
 TBL_WIDTH=200
 TBL_HEIGHT=200
 BALL_RADIUS=10
+SHOW_METRICS=False  # print phase times and hot path counts after each solve
+ANIMATE_PATH=False  # play the ball's path back on the table after each solve
 
 
 def main():
     root = Tk()
     root.resizable(0, 0)
+    metrics.enable(SHOW_METRICS)
 
     frame_t = Frame(root)
     frame_t.pack(fill=BOTH, expand=False)
 
     table = ZenTable(frame_t, TBL_WIDTH, TBL_HEIGHT)
 
+    # the solvers work on their own copy of the table in a background thread, and what
+    # they draw comes back to this one as it arrives
+    def show_progress(phase, counts):
+        buttons.set_status(" ".join([phase] + ["%s %d" % kv for kv in sorted(counts.items())]))
+
+    def job_done(result, error):
+        if metrics.enabled:
+            print metrics.summary()
+            metrics.reset()
+        if error is None:
+            buttons.set_status("done")
+            if ANIMATE_PATH:
+                bs.animate_path(table=table)
+        elif isinstance(error, SolveCancelled):
+            buttons.set_status("stopped")
+        else:
+            buttons.set_status("failed: %s" % error)
+
+    worker = SolveWorker(root, table, show_progress, job_done)
+    worker_table = TableModel(TBL_WIDTH, TBL_HEIGHT, worker.renderer)
+
     ball = Ball(BALL_RADIUS)
-    bs = BoustrophedonSolver(table, ball)
-    cs = ContourSolver(table, ball, bs.is_rockpoint)
-    bg = LinearBackground(table, ball)
+    bs = BoustrophedonSolver(worker_table, ball)
+    cs = ContourSolver(worker_table, ball, bs.is_rockpoint)
+    bg = LinearBackground(worker_table, ball)
 
-    def solve_boustrophedon():
-        print "--------------" #
-        #table.debug()
-        bs.solve()
-        #bs.animate_path(15)
+    def draw_solution():
         bs.show_covered_points()
         bs.show_visited_points()
-        cs.solve(bs.get_visited_list(), 3)
         cs.draw_contours()
-        bg.solve(bs.get_visited_list(), dict([(p, v is not None) for (p, v) in cs.proximity_map.iteritems()]))
         bg.draw()
 
+    pipeline = solve_pipeline(bs, cs, bg, draw_solution)
+
+    def solve_job(progress):
+        bs.progress = progress
+        cs.progress = progress
+        try:
+            return pipeline.get("render")
+        except Exception:
+            # a stage stopped halfway, so start over next time
+            pipeline.clear()
+            raise
+
+    def solve_boustrophedon():
+        if worker.is_running(): return
+        bs.stop_animating()
+        print "--------------" #
+        #table.debug()
+        # hand the rocks drawn since last time to the worker's table; only what's near them
+        # gets solved again
+        region = table.take_dirty_region()
+        if region is not None:
+            x0, y0, x1, y1 = region
+            rocks = table.get_rock_region(x0, y0, x1, y1)
+            for x in range(x0, x1):
+                worker_table.rockpoint[x][y0:y1] = rocks[x - x0].tolist()
+            worker_table.mark_dirty(x0, y0, x1, y1)
+            pipeline.touch("rocks")
+        worker.start(solve_job)
+
 
     def on_reset():
+        worker.cancel()
         bs.stop_animating()
         table.resetSimulation()
 
 
-    def draw_ripples():
+    def ripple_job(progress):
         rip = SandRipple(TBL_WIDTH, TBL_HEIGHT)
         for i in range(200):
-            print "Iteration #", i
+            progress.report("ripples", iteration=i)
             rip.iterate(20.0, 0.5, 0.0, 0.0, 0.1, 0.8, 0, 1)
 
-            for x, col in enumerate(rip.normalize(255)):
-                for y, val in enumerate(col):
-                    myColor = "#%0.2x%0.2x%0.2x" % ((val,) * 3)
-                    table.draw_point(x, y, myColor)
-            table.drawing_area.update_idletasks()
+            worker_table.blit(rip.normalize(255))
+            worker_table.flush()
+
+    def draw_ripples():
+        worker.start(ripple_job)
 
             
     buttons = ButtonBar(root, solve_boustrophedon, on_reset) # do the explorer
-    #buttons = ButtonBar(root, draw_ripples, table.resetSimulation)        # do the sand ripple sim
+    #buttons = ButtonBar(root, draw_ripples, on_reset)        # do the sand ripple sim
     root.mainloop()
 
 
+def solve_pipeline(bs, cs, bg, render=None):
+    """
+    the solve as lazy stages: coverage -> proximity -> contours and background -> render
+
+    parameters are "rocks" (touch it when rocks were drawn), "num_contours" and "optimize".
+    each stage only runs when something it depends on changed, and catches up in place
+    when it can: new rocks only redo what's near them, while a new num_contours starts
+    over from the proximity field but leaves the coverage alone
+    """
+    table = bs.table
+    everywhere = (0, 0, table.table_width, table.table_height)
+
+    def stage(name, fn):
+        # each stage is a phase to report and time, and a chance to stop
+        def run(changed, *inputs):
+            if bs.progress is not None:
+                bs.progress.report(name)
+            with metrics.timer(name):
+                return fn(changed, *inputs)
+        return run
+
+    def coverage(changed, rocks, optimize):
+        # the points that are no longer reachable, or None if solved from scratch
+        if set(["rocks"]) == changed:
+            removed = bs.update()
+        else:
+            bs.solve()
+            removed = None
+        if optimize and removed is None:
+            bs.optimize_path()
+        return removed
+
+    def proximity(changed, removed, num_contours):
+        # the region of the field that changed, or None
+        if "num_contours" in changed or removed is None:
+            cs.solve_field(bs.get_reachable_list(), num_contours)
+            return everywhere
+        return cs.update_field(removed)
+
+    def contours(changed, region):
+        if everywhere == region:
+            cs.trace_contours()
+        elif region is not None:
+            cs.retrace_contours(region)
+        return cs.contours
+
+    def background(changed, region):
+        if everywhere == region:
+            bg.solve(bs.reachable, cs.foreground)
+        elif region is not None:
+            bg.update(bs.reachable, cs.foreground, region)
+        return bg.segments
+
+    pipeline = Pipeline()
+    pipeline.set(rocks=None, num_contours=3, optimize=False)
+    pipeline.add_stage("coverage",   stage("coverage",   coverage),   ["rocks", "optimize"])
+    pipeline.add_stage("proximity",  stage("proximity",  proximity),  ["coverage", "num_contours"])
+    pipeline.add_stage("contours",   stage("contours",   contours),   ["proximity"])
+    pipeline.add_stage("background", stage("background", background), ["proximity"])
+    if render is not None:
+        pipeline.add_stage("render", stage("render", lambda changed, *inputs: render()),
+                           ["coverage", "contours", "background"])
+    return pipeline
+
+
+def solve_headless(layout_file, output_file, num_contours=3, ball_radius=BALL_RADIUS, optimize=False,
+                   tolerance=None, cache=None):
+    """
+    run the same pipeline as the OK button on a rock layout file, with no display
+
+    results are written to output_file as JSON and also returned.  with a tolerance, the
+    path, contours and background are also given as line and arc motion commands.  with a
+    cache (see solve_cache.SolveCache), a layout solved before is loaded instead of solved
+    """
+    with metrics.timer("load"):
+        table = TableModel.load(layout_file)
+
+    ball = Ball(ball_radius)
+    bs = BoustrophedonSolver(table, ball)
+    cs = ContourSolver(table, ball, bs.is_rockpoint)
+    bg = LinearBackground(table, ball)
+
+    key = entry = None
+    if cache is not None:
+        mode = (bs.coverage_mode, bs.planner_name, cs.method, optimize)
+        with metrics.timer("cache"):
+            key = SolveCache.key(table.rockpoint, ball_radius, mode, num_contours)
+            entry = cache.load(key)
+
+    if entry is not None:
+        print "Loaded solution", key, "from cache"
+        bs.restore(entry["path"], entry["visited"], entry["covered"])
+        cs.restore(entry["contours"], entry["foreground"], num_contours)
+        bg.solve(bs.reachable, cs.foreground)
+    else:
+        pipeline = solve_pipeline(bs, cs, bg)
+        pipeline.set(num_contours=num_contours, optimize=optimize)
+        pipeline.get("contours")
+        pipeline.get("background")
+        if cache is not None:
+            with metrics.timer("cache"):
+                cache.store(key, bs.path, bs.visited, bs.covered, cs.foreground, cs.contours)
+    visited = bs.get_visited_list()
+
+    results = {
+        "width":      table.table_width,
+        "height":     table.table_height,
+        "radius":     ball_radius,
+        "path":       bs.path,
+        "visited":    visited,
+        "covered":    bs.get_covered_list(),
+        "contours":   cs.contours,
+        "background": bg.segments,
+        }
+
+    if tolerance is not None:
+        compressor = PathCompressor(tolerance)
+        with metrics.timer("compress"):
+            results["commands"] = {
+                "path":       compressor.compress_path(bs.path),
+                "contours":   [compressor.compress(c) for c in cs.contours],
+                "background": [compressor.compress(l) for l in bg.get_lines()],
+                }
+        print "Compressed", compressor.points_in, "points to", compressor.commands_out, "commands,",
+        print "ratio", round(compressor.ratio(), 1)
+
+    with metrics.timer("write"):
+        with open(output_file, "w") as f:
+            json.dump(results, f)
+
+    return results
+
+
+def main_headless(argv):
+    parser = argparse.ArgumentParser(description="Solve a zen table rock layout without a display")
+    parser.add_argument("layout", help="rock layout file: one text line per row, '#' for rock, or a rock map")
+    parser.add_argument("output", help="where to write the JSON results")
+    parser.add_argument("--contours", type=int, default=3, help="number of contours around rocks")
+    parser.add_argument("--radius", type=int, default=BALL_RADIUS, help="ball radius in pixels")
+    parser.add_argument("--optimize", action="store_true", help="reorder the path to cut down transit moves")
+    parser.add_argument("--compress", type=float, metavar="TOLERANCE",
+                        help="also write line/arc motion commands within this many pixels")
+    parser.add_argument("--save-rocks", metavar="FILE", help="also save the layout as a bit-packed rock map")
+    parser.add_argument("--rle", action="store_true", help="run-length encode the saved rock map")
+    parser.add_argument("--cache", metavar="DIR", help="reuse solutions of layouts seen before, kept in DIR")
+    parser.add_argument("--cache-size", type=float, default=64, metavar="MB",
+                        help="how big the cache may grow before old solutions are dropped")
+    parser.add_argument("--metrics", action="store_true", help="print phase times and hot path counts")
+    parser.add_argument("--metrics-json", metavar="FILE", help="write phase times and hot path counts to FILE")
+    args = parser.parse_args(argv)
+    metrics.enable(args.metrics or args.metrics_json is not None)
+
+    cache = None
+    if args.cache:
+        cache = SolveCache(args.cache, int(args.cache_size * 1024 * 1024))
+
+    if args.save_rocks:
+        TableModel.load(args.layout).save_rock_map(args.save_rocks, args.rle)
+
+    solve_headless(args.layout, args.output, args.contours, args.radius, args.optimize, args.compress, cache)
+
+    if args.metrics:
+        print metrics.summary()
+    if args.metrics_json:
+        metrics.save(args.metrics_json)
+
+
 
 if __name__ == "__main__":
-   main()
+   if 1 < len(sys.argv):
+       main_headless(sys.argv[1:])
+   else:
+       main()
@@ -0,0 +1,141 @@
+
+import numpy
+from rock_map import RockMap
+import metrics
+
+
+class TableModel(object):
+    """
+    the data behind a zen table: its size, where the rocks are, and optionally a renderer
+
+    the renderer (e.g. a FrameBuffer) is anything with draw_point, draw_points, blit and flush.
+    without one, all drawing is ignored, so the solvers can run without a display.
+    rockpoint is a list of lists, or a RockMap for tables loaded from a rock map file
+    """
+
+    ROCK_CHARS = "#Xx1"
+
+    def __init__(self, table_width, table_height, renderer=None, rock_map=None):
+        self.table_width = table_width
+        self.table_height = table_height
+        self.renderer = renderer
+        if rock_map is None:
+            self.reset_rocks()
+        else:
+            self.rockpoint = rock_map
+            self.dirty = (0, 0, table_width, table_height)
+
+
+    def reset_rocks(self):
+        self.rockpoint = [[False for y in range(self.table_height)] for x in range(self.table_width)]
+        self.dirty = (0, 0, self.table_width, self.table_height)
+
+
+    def set_rockpoint(self, x, y, is_rock=True):
+        # negative indexes would wrap around to the far side of the table
+        if not (0 <= x < self.table_width and 0 <= y < self.table_height):
+            raise IndexError("(%d, %d) is off the table" % (x, y))
+        if isinstance(self.rockpoint, RockMap):
+            self.rockpoint.set(x, y, is_rock)
+        else:
+            self.rockpoint[x][y] = is_rock
+        self.mark_dirty(x, y, x + 1, y + 1)
+
+
+    def mark_dirty(self, x0, y0, x1, y1):
+        """
+        grow the region of changed rocks (x1 and y1 exclusive) to include this one, as far
+        as it's on the table
+        """
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.table_width, x1), min(self.table_height, y1)
+        if x0 >= x1 or y0 >= y1: return
+        if self.dirty is not None:
+            dx0, dy0, dx1, dy1 = self.dirty
+            x0, y0, x1, y1 = min(x0, dx0), min(y0, dy0), max(x1, dx1), max(y1, dy1)
+        self.dirty = (x0, y0, x1, y1)
+
+
+    def take_dirty_region(self):
+        """
+        the (x0, y0, x1, y1) region where rocks changed since the last call, or None
+        """
+        region = self.dirty
+        self.dirty = None
+        return region
+
+
+    def get_rockpoint(self):
+        # copy the 2D array of rock points.  a rock map is handed out as is, to be read in place
+        if isinstance(self.rockpoint, RockMap):
+            return self.rockpoint
+        return [row[:] for row in self.rockpoint]
+
+
+    def get_rock_region(self, x0, y0, x1, y1):
+        # copy part of the rock points, as a boolean array
+        return numpy.array([col[y0:y1] for col in self.rockpoint[x0:x1]], dtype=bool).reshape(x1 - x0, y1 - y0)
+
+
+    def get_drawing_area(self):
+        if self.renderer is None: return None
+        return self.renderer.canvas
+
+
+    def draw_point(self, x, y, color):
+        if metrics.enabled: metrics.count("draw_point")
+        if self.renderer is not None:
+            self.renderer.draw_point(x, y, color)
+
+    def draw_points(self, points, color):
+        if metrics.enabled:
+            metrics.count("draw_points")
+            metrics.count("points_drawn", len(points))
+        if self.renderer is not None:
+            self.renderer.draw_points(points, color)
+
+    def blit(self, array):
+        if self.renderer is not None:
+            self.renderer.blit(array)
+
+    def flush(self):
+        if self.renderer is not None:
+            self.renderer.flush()
+
+
+    @staticmethod
+    def load(filename, renderer=None):
+        """
+        read a rock layout from a text file: one line per y, one character per x
+
+        "#" (or X, x, 1) is a rock, anything else is sand.  rock map files (see save_rock_map)
+        are recognized and memory mapped instead
+        """
+        if RockMap.is_rock_map_file(filename):
+            rock_map = RockMap.load(filename)
+            return TableModel(rock_map.width, rock_map.height, renderer, rock_map)
+
+        with open(filename) as f:
+            lines = [l.rstrip("\r\n") for l in f]
+        while lines and not lines[-1]:
+            lines.pop()
+
+        table = TableModel(max(len(l) for l in lines), len(lines), renderer)
+        for y, line in enumerate(lines):
+            for x, c in enumerate(line):
+                if c in TableModel.ROCK_CHARS:
+                    table.set_rockpoint(x, y)
+        return table
+
+
+    def save(self, filename):
+        rocks = numpy.asarray(self.rockpoint, dtype=bool)
+        with open(filename, "w") as f:
+            for y in range(self.table_height):
+                f.write("".join("#" if is_rock else "." for is_rock in rocks[:, y].tolist()))
+                f.write("\n")
+
+
+    def save_rock_map(self, filename, rle=False):
+        # bit-packed, or run-length encoded for mostly empty tables
+        RockMap.from_rockpoint(self.rockpoint).save(filename, rle)
@@ -1,6 +1,9 @@
 from Tkinter import Tk, Canvas, RIGHT, BOTH, RAISED
 from ttk import Frame, Button, Style
 
+from frame_buffer import FrameBuffer
+from table_model import TableModel
+
 
 class ZenTable(Frame):
    """
@@ -35,24 +38,29 @@ class ZenTable(Frame):
 
    def resetSimulation(self):
        # clear rockpoint array
-       self.rockpoint = [[False for y in range(self.table_height)] for x in range(self.table_width)]
+       self.model.reset_rocks()
+       self.rockpoint = self.model.rockpoint
 
        # clear pixels
-       for x in range(self.table_width):
-           for y in range(self.table_height):
-               self.draw_point(x, y, "gray")
+       self.framebuffer.fill("gray")
 
 
    def initCanvas(self):
-       def makePoint(x, y):
-           return self.drawing_area.create_line(x, y, x+1, y, smooth=False, fill="gray")
-       
-       self.canvaspoint = [[makePoint(x, y) for y in range(self.table_height)] for x in range(self.table_width)]
+       # one image for the whole table instead of one canvas item per pixel
+       self.framebuffer = FrameBuffer(self.drawing_area, self.table_width, self.table_height)
+       self.model = TableModel(self.table_width, self.table_height, self.framebuffer)
 
 
    def get_rockpoint(self):
        # copy the 2D array of rock points
-       return [row[:] for row in self.rockpoint]
+       return self.model.get_rockpoint()
+
+   def get_rock_region(self, x0, y0, x1, y1):
+       return self.model.get_rock_region(x0, y0, x1, y1)
+
+   # where rocks were drawn since the last solve, as (x0, y0, x1, y1), or None
+   def take_dirty_region(self):
+       return self.model.take_dirty_region()
 
    def get_drawing_area(self):
        return self.drawing_area
@@ -72,7 +80,7 @@ class ZenTable(Frame):
    def reg_point(self, event):
        if not self.b1up:
            try:
-               self.rockpoint[event.x][event.y] = True
+               self.model.set_rockpoint(event.x, event.y)
                self.draw_large_point(event.x, event.y)
            except IndexError:
                print "Ignoring %s, %s" % (event.x, event.y)
@@ -80,14 +88,25 @@ class ZenTable(Frame):
 
    # draw using the points already in the canvas
    def draw_large_point(self, x, y, color="red"):
-       for yy in range(y-1, y+2):
-           for xx in range(x-1, x+2):
-               self.draw_point(xx, yy, color)
+       self.draw_points([(xx, yy) for yy in range(y-1, y+2) for xx in range(x-1, x+2)], color)
        
 
    # draw using the points already in the canvas
    def draw_point(self, x, y, color):
-       self.drawing_area.itemconfig(self.canvaspoint[x][y], fill=color)
+       self.model.draw_point(x, y, color)
+
+   # draw many points in one color; they show up on the next flush
+   def draw_points(self, points, color):
+       self.model.draw_points(points, color)
+
+   # replace the whole picture with an [x][y] array of gray levels or (r, g, b)
+   def blit(self, array):
+       self.model.blit(array)
+
+   # push everything drawn so far to the screen
+   def flush(self):
+       self.model.flush()
+       self.drawing_area.update_idletasks()
 
 
    def debug(self):